@@ -1,6 +1,6 @@
 from cleo import Application
 
-from rgov.commands import check, check_daemon, initialize, run, search
+from rgov.commands import check, check_daemon, initialize, run, search, stats, watch
 
 commands = [
     check.CheckCommand(),
@@ -8,6 +8,8 @@ commands = [
     initialize.InitCommand(),
     run.RunCommand(),
     check_daemon.DaemonCommand(),
+    stats.StatsCommand(),
+    watch.WatchCommand(),
 ]
 
 application = Application()
@@ -0,0 +1,157 @@
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+from rgov import locations
+
+# Seconds a cached month document is served without asking upstream.
+DEFAULT_TTL = 60
+
+# Entries older than this many seconds are deleted on write.
+PURGE_AGE = 24 * 60 * 60
+
+
+class CacheEntry:
+    __slots__ = ("body", "fetched_at", "etag", "last_modified")
+
+    def __init__(self, body, fetched_at, etag=None, last_modified=None):
+        self.body = body
+        self.fetched_at = fetched_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def validators(self) -> tuple:
+        return self.etag, self.last_modified
+
+
+class MonthCache:
+    """Stores raw availability month documents on disk, keyed by
+    campground id and month start date, so that every rgov process on
+    the host can share them. A ttl of 0 disables the cache.
+
+    Entries past their ttl are kept, along with the response's ETag and
+    Last-Modified validators, so they can be revalidated with a
+    conditional request instead of downloaded again.
+
+    The database is opened in WAL mode with a busy timeout, so any
+    number of processes may read and write it at once. Errors from the
+    database are treated as cache misses rather than raised."""
+
+    def __init__(self, path=locations.CACHE_DB, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                """CREATE TABLE IF NOT EXISTS months (
+                    campground_id TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    PRIMARY KEY (campground_id, month)
+                )"""
+            )
+            # Databases written before validators were stored.
+            columns = [row[1] for row in con.execute("PRAGMA table_info(months)")]
+            for column in ("etag", "last_modified"):
+                if column not in columns:
+                    con.execute(f"ALTER TABLE months ADD COLUMN {column} TEXT")
+            self._local.con = con
+        return con
+
+    def get(self, campground_id: str, month: str):
+        """Returns the CacheEntry for the month, fresh or not, or None
+        if there is none."""
+        if self.ttl <= 0:
+            return None
+
+        sql_statement = """SELECT body, fetched_at, etag, last_modified
+                           FROM months
+                           WHERE campground_id = ? AND month = ?"""
+        try:
+            con = self._connect()
+            with contextlib.closing(con.cursor()) as cur:
+                cur.execute(sql_statement, (campground_id, month))
+                row = cur.fetchone()
+        except sqlite3.Error:
+            return None
+
+        if row is None:
+            return None
+        return CacheEntry(bytes(row[0]), row[1], row[2], row[3])
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(
+        self,
+        campground_id: str,
+        month: str,
+        body: bytes,
+        etag=None,
+        last_modified=None,
+    ):
+        if self.ttl <= 0:
+            return
+
+        now = time.time()
+        try:
+            con = self._connect()
+            with con:
+                con.execute(
+                    """INSERT OR REPLACE INTO months
+                       (campground_id, month, body, fetched_at, etag,
+                        last_modified)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (campground_id, month, body, now, etag, last_modified),
+                )
+                con.execute(
+                    "DELETE FROM months WHERE fetched_at < ?", (now - PURGE_AGE,)
+                )
+        except sqlite3.Error:
+            pass
+
+    def touch(self, campground_id: str, month: str):
+        """Marks an entry as fetched now, after upstream confirmed it
+        hasn't changed."""
+        if self.ttl <= 0:
+            return
+
+        try:
+            con = self._connect()
+            with con:
+                con.execute(
+                    """UPDATE months SET fetched_at = ?
+                       WHERE campground_id = ? AND month = ?""",
+                    (time.time(), campground_id, month),
+                )
+        except sqlite3.Error:
+            pass
+
+
+_default = None
+
+
+def set_default(cache):
+    """Replaces the cache used by campgrounds created without one. Pass
+    None to go back to the default on-disk cache."""
+    global _default
+    _default = cache
+
+
+def get_default() -> MonthCache:
+    global _default
+    if _default is None:
+        _default = MonthCache()
+    return _default
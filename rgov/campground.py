@@ -1,13 +1,73 @@
 import contextlib
+import datetime
 import json
 import sqlite3
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.error import HTTPError
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 
-from fake_useragent import UserAgent
-from rgov import locations
+from rgov import cache, dates, locations, metrics, parse, transport, useragent
+
+# Upper bound on the number of month documents fetched at the same time
+# for a single campground.
+MAX_WORKERS = 4
+
+# Seconds a fetched month is used before it is fetched again.
+MAX_AGE = 60
+
+ENDPOINT = "https://www.recreation.gov/api/camps/availability/campground"
+
+
+def request_document(
+    id_num: str, date: str, month_cache=None, validators=(None, None), revalidate=False
+):
+    """Returns the availability document of a campground for the month
+    starting on date as a cache.CacheEntry. The month cache is
+    consulted first, falling back to the process-wide default, unless
+    revalidate is set. Otherwise, the document is requested
+    conditionally on the validators of the cached entry, or on
+    validators if there is none. Returns None if upstream answered 304
+    to validators, i.e. the document they came from is unchanged."""
+    month_cache = month_cache or cache.get_default()
+    entry = month_cache.get(id_num, date)
+    if entry is not None and month_cache.is_fresh(entry) and not revalidate:
+        metrics.inc("cache", result="hit")
+        return entry
+
+    url = f"{ENDPOINT}/{id_num}/month?"
+    date_query = urlencode({"start_date": date})
+    url = url + date_query
+    headers = {"User-Agent": useragent.get()}
+
+    if entry is not None:
+        validators = entry.validators
+    etag, last_modified = validators
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    start = time.perf_counter()
+    try:
+        response = transport.get(url, headers)
+    except HTTPError:
+        raise
+    finally:
+        metrics.observe("month_seconds", time.perf_counter() - start, campground=id_num)
+
+    if response.status == 304:
+        metrics.inc("cache", result="revalidated")
+        if entry is not None:
+            month_cache.touch(id_num, date)
+        return entry
+
+    metrics.inc("cache", result="miss")
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    month_cache.put(id_num, date, response.body, etag, last_modified)
+    return cache.CacheEntry(response.body, time.time(), etag, last_modified)
 
 
 class AvailabilityNotFoundError(Exception):
@@ -24,70 +84,448 @@ class AvailabilityNotFoundError(Exception):
         return self.message
 
 
+class Site:
+    """A campsite's availability over one month. Bit d - 1 of mask is
+    set if the site is available on day d of the month."""
+
+    __slots__ = ("id_num", "site", "mask")
+
+    def __init__(self, id_num, site, mask):
+        self.id_num = id_num
+        self.site = site
+        self.mask = mask
+
+
+class Month:
+    """Compact availability of every site at a campground for one
+    month. first is the day ordinal of the 1st of the month, and
+    fingerprint is equal for months with the same availability."""
+
+    __slots__ = ("year", "month", "first", "sites", "fingerprint")
+
+    def __init__(self, year, month, sites):
+        self.year = year
+        self.month = month
+        self.first = None
+        if year is not None:
+            self.first = datetime.date(year, month, 1).toordinal()
+        self.sites = sites
+        self.fingerprint = hash(
+            (year, month, tuple((site.site, site.mask) for site in sites))
+        )
+
+    @classmethod
+    def from_campsites(cls, campsites: dict, site_filter=None):
+        """Builds a Month from the campsites of a month document,
+        skipping sites site_filter rejects. Every site shares the same
+        date keys, so each key is converted to a day only once."""
+        year = month = None
+        bits = {}
+        sites = []
+        for id_num, site in campsites.items():
+            if site_filter and not site_filter(site):
+                continue
+            availabilities = site["availabilities"]
+            if year is None and availabilities:
+                date = next(iter(availabilities))
+                year, month = int(date[:4]), int(date[5:7])
+            mask = 0
+            for date, status in availabilities.items():
+                if status == "Available":
+                    bit = bits.get(date)
+                    if bit is None:
+                        bit = bits[date] = 1 << (int(date[8:10]) - 1)
+                    mask |= bit
+            sites.append(Site(id_num, site["site"], mask))
+        return cls(year, month, sites)
+
+
+def _tally(label, hits: int, first: int, d: dict, m: dict):
+    """Records the days set in hits, a mask over the month starting on
+    the ordinal first, for the site label in the per-date lists d and
+    the per-site counts m."""
+    m[label] += bin(hits).count("1")
+    day = first
+    while hits:
+        if hits & 1:
+            d[day].append(label)
+        hits >>= 1
+        day += 1
+
+
+def stay_masks(stay_ordinals: list) -> dict:
+    """Groups stay dates, given as day ordinals, by month as
+    {ordinal of the 1st: mask} with the same bit layout as
+    Site.mask."""
+    masks = defaultdict(int)
+    for ordinal in stay_ordinals:
+        day = datetime.date.fromordinal(ordinal).day
+        masks[ordinal - day + 1] |= 1 << (day - 1)
+    return masks
+
+
 class Campground:
-    def __init__(self, id_num):
+    def __init__(
+        self,
+        id_num,
+        max_workers=MAX_WORKERS,
+        month_cache=None,
+        selective=False,
+        use_matrix=False,
+        max_age=MAX_AGE,
+        site_filter=None,
+    ):
         self.id_num = id_num
+        self.max_workers = max_workers
+        self.max_age = max_age
+        # A parse.SiteFilter; rejected sites are dropped while parsing.
+        self.site_filter = site_filter
+        self.month_cache = month_cache
+        # Keep only the stay dates' availabilities when parsing months.
+        self.selective = selective
+        # Answer queries from a numpy AvailabilityMatrix.
+        self.use_matrix = use_matrix
+        self._matrix = None
         self._name = None
         self._available = None
         self._dates_available = None
         self._url = None
         self._cli_text = None
+        self._windows = None
+        self._recurring = None
+        # Query and fingerprint the current results were computed from.
+        self._evaluated = None
+        # Months of the current query, in order.
         self._request_data = None
+        # Every month held, by request date:
+        # {date: (month, fetched_at, wanted)}
+        self._months = {}
+        # Last parsed Month per request date with the validators of the
+        # document it came from and the stay dates it was trimmed to:
+        # {date: (validators, wanted, month)}
+        self._parsed = {}
 
-    def _request(self, request_dates: list):
-        endpoint = "https://www.recreation.gov/api/camps/availability/campground"
-        requests = []
-        for date in request_dates:
-            url = f"{endpoint}/{self.id_num}/month?"
-            date_query = urlencode({"start_date": date})
-            url = url + date_query
-            req = Request(url)
-            req.add_header("User-Agent", UserAgent().random)
+    def _wanted(self, stay_dates):
+        if self.selective and stay_dates is not None:
+            return frozenset(stay_dates)
+        return None
 
-            try:
-                data = urlopen(req)
-            except HTTPError:
-                raise
+    def _reusable(self, date: str, wanted):
+        """Returns the last parse of the month if it holds everything
+        wanted, otherwise None."""
+        parsed = self._parsed.get(date)
+        if parsed is None:
+            return None
+        parsed_wanted = parsed[1]
+        if parsed_wanted is None or (wanted is not None and wanted <= parsed_wanted):
+            return parsed
+        return None
 
-            data = json.loads(data.read())
+    def load_document(self, date: str, entry, stay_dates=None) -> Month:
+        """Returns the month document in entry, a cache.CacheEntry, as a
+        Month, reusing the last parse if the document hasn't changed
+        since. In selective mode, only the availabilities on stay_dates
+        are kept."""
+        wanted = self._wanted(stay_dates)
+        parsed = self._reusable(date, wanted)
+        if parsed is not None and any(entry.validators):
+            if parsed[0] == entry.validators:
+                return parsed[2]
 
-            # This fails if the campground id is invalid.
-            try:
-                campsites = data["campsites"]
-            except KeyError:
-                raise
+        month = self._parse(entry.body, wanted)
+        self._parsed[date] = (entry.validators, wanted, month)
+        return month
 
-            requests.append(campsites)
+    def _parse(self, body: bytes, wanted) -> Month:
+        start = time.perf_counter()
+        month = Month.from_campsites(
+            parse.parse_campsites(body, wanted, self.site_filter)
+        )
+        metrics.observe("parse_seconds", time.perf_counter() - start)
+        return month
 
+    def fetch_month(self, date: str, stay_dates=None) -> Month:
+        """Fetches the availability document for the month starting on
+        the given date and returns it as a Month. A 304 reuses the last
+        parse. In selective mode, only the availabilities on stay_dates
+        are kept."""
+        parsed = self._reusable(date, self._wanted(stay_dates))
+        entry = request_document(
+            self.id_num,
+            date,
+            self.month_cache,
+            parsed[0] if parsed is not None else (None, None),
+        )
+        if entry is None:
+            return parsed[2]
+        # This fails if the campground id is invalid.
+        try:
+            return self.load_document(date, entry, stay_dates)
+        except KeyError:
+            raise
+
+    def _request(self, request_dates: list, stay_dates=None):
+        """Fetches every month in request_dates concurrently, at most
+        max_workers at a time, and stores them in month order."""
+        workers = max(1, min(self.max_workers, len(request_dates)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() yields in submission order and re-raises the first
+            # failed month when its result is reached.
+            requests = list(
+                executor.map(
+                    lambda date: self.fetch_month(date, stay_dates),
+                    request_dates,
+                )
+            )
+
+        for date, month in zip(request_dates, requests):
+            self.store_month(date, month, stay_dates)
         self._request_data = requests
 
-    def get_available(self, request_dates: list, stay_dates: list, test=False):
-        """Finds available sites, if any, at the campground. If test is
-        True, then loads campground data from the test file instead of
-        from a live request."""
+    def store_month(self, date: str, month: Month, stay_dates=None):
+        """Holds month, as fetched for stay_dates, for the next
+        queries."""
+        self._months[date] = (month, time.time(), self._wanted(stay_dates))
+
+    def stale_months(self, request_dates: list, stay_dates=None) -> list:
+        """Returns the request dates whose months are missing, older
+        than max_age, or trimmed to other stay dates."""
+        wanted = self._wanted(stay_dates)
+        now = time.time()
+        stale = []
+        for date in request_dates:
+            held = self._months.get(date)
+            if held is None:
+                stale.append(date)
+                continue
+            _, fetched_at, held_wanted = held
+            expired = now - fetched_at >= self.max_age
+            trimmed = held_wanted is not None and not (
+                wanted is not None and wanted <= held_wanted
+            )
+            if expired or trimmed:
+                stale.append(date)
+        return stale
+
+    @property
+    def fingerprint(self) -> int:
+        """Equal between queries whose months had the same
+        availability."""
+        return hash(tuple(month.fingerprint for month in self._request_data))
+
+    @property
+    def months_fingerprint(self) -> int:
+        """Equal while every month held has the same availability."""
+        return hash(
+            frozenset((date, held[0].fingerprint) for date, held in self._months.items())
+        )
+
+    def expire(self):
+        """Forgets every month held, so that the next query fetches
+        them again. The last parse of each month is kept, so unchanged
+        months are still revalidated instead of downloaded."""
+        self._months.clear()
+
+    def _unchanged(self, query: tuple) -> bool:
+        """Returns True if the results of query were already computed
+        from months with the current availability."""
+        evaluated = (query, self.fingerprint)
+        if evaluated == self._evaluated:
+            return True
+        self._evaluated = evaluated
+        return False
+
+    @property
+    def fetched_months(self) -> dict:
+        """{request date: time fetched} for every month held."""
+        return {date: held[1] for date, held in self._months.items()}
+
+    def _load(self, request_dates: list, stay_dates: list, test=False):
+        """Makes sure _request_data can answer a query over stay_dates,
+        fetching only the months that are missing or expired."""
         if test:
             with open(locations.EXAMPLE_DATA, "r") as f:
                 f = f.read()
-                self._request_data = json.loads(f)
+                self._request_data = [
+                    Month.from_campsites(campsites, self.site_filter)
+                    for campsites in json.loads(f)
+                ]
         else:
-            if self._request_data is None:
+            stale = self.stale_months(request_dates, stay_dates)
+            if stale:
                 try:
-                    self._request(request_dates)
+                    self._request(stale, stay_dates)
                 except (HTTPError, KeyError):
                     raise
+            self._request_data = [self._months[date][0] for date in request_dates]
+
+    def get_available(self, request_dates: list, stay_dates: list, test=False):
+        """Finds available sites, if any, at the campground. If test is
+        True, then loads campground data from the test file instead of
+        from a live request."""
+        self._load(request_dates, stay_dates, test)
+        if self._unchanged(("available", tuple(stay_dates), self.use_matrix)):
+            return
+
+        # Computation works on day ordinals from here on.
+        stay_ordinals = [dates.to_ordinal(date) for date in stay_dates]
+        if self.use_matrix:
+            self._evaluate_matrix(stay_ordinals)
+        else:
+            self._evaluate(stay_ordinals)
+
+    def _evaluate_matrix(self, stay_ordinals: list):
+        # Imported here, so that only queries using it pay for numpy.
+        from rgov.matrix import AvailabilityMatrix
+
+        months = tuple(self._request_data)
+        if self._matrix is None or not (
+            len(self._matrix[0]) == len(months)
+            and all(a is b for a, b in zip(self._matrix[0], months))
+        ):
+            self._matrix = (months, AvailabilityMatrix(months))
+        matrix = self._matrix[1]
+        self._dates_available = matrix.per_date_availability(stay_ordinals)
+        self._available = matrix.available(stay_ordinals)
 
+    def _evaluate(self, stay_ordinals: list):
+        masks = stay_masks(stay_ordinals)
         d = defaultdict(list)
         m = defaultdict(int)
-        for request in self._request_data:
-            for site in request.values():
-                for date in stay_dates:
-                    if date in site["availabilities"]:
-                        if site["availabilities"][date] == "Available":
-                            d[date].append(site["site"])
-                            m[site["site"]] += 1
+        for month in self._request_data:
+            required = masks.get(month.first, 0)
+            if not required:
+                continue
+            for site in month.sites:
+                hits = site.mask & required
+                if hits:
+                    _tally(site.site, hits, month.first, d, m)
 
         self._dates_available = d
-        self._available = [k for k, v in m.items() if v == len(stay_dates)]
+        self._available = [k for k, v in m.items() if v == len(stay_ordinals)]
+
+    def get_available_batch(self, stays: list, test=False) -> list:
+        """Evaluates many stays at once. stays is a list of Dates (or
+        anything with request_dates and stay_dates). The union of their
+        months is fetched once and every stay is answered in a single
+        pass over it. Returns an (available, per_date_availability)
+        pair per stay, in order."""
+        request_dates = list(
+            dict.fromkeys(date for stay in stays for date in stay.request_dates)
+        )
+        stay_dates = list(
+            dict.fromkeys(date for stay in stays for date in stay.stay_dates)
+        )
+        self._load(request_dates, stay_dates, test)
+        return self._evaluate_batch(
+            [[dates.to_ordinal(date) for date in stay.stay_dates] for stay in stays]
+        )
+
+    def _evaluate_batch(self, stays: list) -> list:
+        """Answers every list of stay ordinals in stays in one pass over
+        _request_data."""
+        queries = [
+            (stay_masks(stay_ordinals), defaultdict(list), defaultdict(int))
+            for stay_ordinals in stays
+        ]
+        for month in self._request_data:
+            active = []
+            for masks, d, m in queries:
+                required = masks.get(month.first, 0)
+                if required:
+                    active.append((required, d, m))
+            if not active:
+                continue
+            for site in month.sites:
+                for required, d, m in active:
+                    hits = site.mask & required
+                    if hits:
+                        _tally(site.site, hits, month.first, d, m)
+
+        results = []
+        for stay_ordinals, (_, d, m) in zip(stays, queries):
+            n_nights = len(stay_ordinals)
+            results.append(([k for k, v in m.items() if v == n_nights], d))
+        return results
+
+    def get_recurring(self, request_dates: list, windows: list, test=False):
+        """Evaluates every stay in windows, a list of stay date lists
+        such as RecurringDates.windows, after fetching the months in
+        request_dates once."""
+        stay_dates = list(
+            dict.fromkeys(date for stay_dates in windows for date in stay_dates)
+        )
+        self._load(request_dates, stay_dates, test)
+        windows = [[dates.to_ordinal(date) for date in window] for window in windows]
+        results = self._evaluate_batch(windows)
+        self._recurring = {
+            window[0]: available for window, (available, _) in zip(windows, results)
+        }
+
+    @property
+    def recurring(self):
+        """{arrival day ordinal: [site labels]} found by get_recurring."""
+        if self._recurring is not None:
+            return self._recurring
+        else:
+            raise AvailabilityNotFoundError(
+                "Try initializing this attribute "
+                "with the get_recurring() method first."
+            )
+
+    def get_windows(
+        self, request_dates: list, stay_dates: list, length: int, test=False
+    ):
+        """Finds every arrival date in the consecutive nights stay_dates
+        on which a site is free for length nights, fetching each month
+        only once."""
+        self._load(request_dates, stay_dates, test)
+        if self._unchanged(("windows", tuple(stay_dates), length)):
+            return
+
+        first = dates.to_ordinal(stay_dates[0])
+        in_range = (1 << len(stay_dates)) - 1
+
+        # Each site's availability over the whole range; bit i is night
+        # first + i.
+        ranges = {}
+        for month in self._request_data:
+            if month.first is None:
+                continue
+            offset = month.first - first
+            for site in month.sites:
+                if offset >= 0:
+                    mask = (site.mask << offset) & in_range
+                else:
+                    mask = (site.mask >> -offset) & in_range
+                ranges[site.site] = ranges.get(site.site, 0) | mask
+
+        # Slide the window: a bit survives if the length - 1 nights after
+        # it are free too.
+        windows = defaultdict(list)
+        for label, mask in ranges.items():
+            starts = mask
+            for i in range(1, length):
+                starts &= mask >> i
+            i = 0
+            while starts:
+                if starts & 1:
+                    windows[first + i].append(label)
+                starts >>= 1
+                i += 1
+
+        self._windows = dict(sorted(windows.items()))
+
+    @property
+    def windows(self):
+        """{arrival day ordinal: [site labels]} found by get_windows."""
+        if self._windows is not None:
+            return self._windows
+        else:
+            raise AvailabilityNotFoundError(
+                "Try initializing this attribute "
+                "with the get_windows() method first."
+            )
 
     @property
     def per_date_availability(self):
@@ -165,3 +603,24 @@ class Campground:
 
         self._cli_text = f"{col_1:{width}} {col_2}"
         return self._cli_text
+
+    def gen_windows_cli_text(self, width=None):
+        col_1 = f"<info>{self.name}</>:"
+        len_name = len(self.name)
+
+        if not width:
+            width = len_name
+
+        width += len(col_1) - len_name
+
+        n_windows = len(self.windows)
+        if n_windows == 0:
+            col_2 = "<fg=red>full</>"
+        else:
+            arrivals = ", ".join(
+                dates.format_ordinal(ordinal, "%m-%d") for ordinal in self.windows
+            )
+            col_2 = f"arrive <fg=cyan>{arrivals}</>"
+
+        self._cli_text = f"{col_1:{width}} {col_2}"
+        return self._cli_text
@@ -1,12 +1,11 @@
-from datetime import datetime
-from urllib.error import HTTPError
-
 from cleo import Command
 from cleo.helpers import argument, option
 
-from rgov import utils
+from rgov import cache, engine, utils
 from rgov.campground import Campground
-from rgov.dates import Dates
+from rgov.commands.watch import search_options, search_spec
+from rgov.dates import DateRange, Dates, RecurringDates, format_ordinal
+from rgov.parse import SiteFilter
 
 
 class CheckCommand(Command):
@@ -20,6 +19,28 @@ class CheckCommand(Command):
     options = [
         option("cron-mode", "c", "Run once and notify if availability found"),
         option("url", "u", "Print the campground url(s) with the output"),
+        option(
+            "workers",
+            "w",
+            f"Maximum number of requests in flight at once [{engine.MAX_WORKERS}]",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "every",
+            "e",
+            "With --flexible, only check stays arriving on this day of the week (e.g. fri)",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "cache-ttl",
+            "t",
+            f"Seconds to reuse fetched availability, 0 to disable [{cache.DEFAULT_TTL}]",
+            flag=False,
+            value_required=True,
+        ),
+        *search_options(),
     ]
 
     help = """The <question>check</> command prints out a summary of campsite availability for the the given campground(s) over the specified date range. 
@@ -37,6 +58,18 @@ Check if North Rim Campground has available sites on February 2nd, 2022 for 3 ni
 Check if North Rim and Spring Canyon campgrounds have available sites on March 20th, 2022 for 4 nights:
 
     $ <info>rgov check 3-20-2022 4 232489 234064</>
+
+Find every 3 night stay at North Rim Campground in July 2022:
+
+    $ <info>rgov check --flexible 7-31-2022 7-1-2022 3 232489</>
+
+Find every Friday and Saturday night stay at North Rim and Spring Canyon campgrounds from May to September 2022:
+
+    $ <info>rgov check --every fri --flexible 9-30-2022 5-1-2022 2 232489 234064</>
+
+Only check tent sites for a party of 6 at North Rim Campground:
+
+    $ <info>rgov check --site-type tent --party-size 6 2-2-2022 3 232489</>
 """
 
     def handle(self) -> int:
@@ -44,23 +77,70 @@ Check if North Rim and Spring Canyon campgrounds have available sites on March 2
         date_input = self.argument("date")
         length_input = self.argument("length")
 
-        campgrounds = [Campground(id) for id in ids_input]
-        dates = Dates(date_input, length_input)
+        try:
+            site_filter = SiteFilter.from_spec(search_spec(self))
+        except ValueError as error:
+            self.line(str(error))
+            return 1
+
+        flexible_input = self.option("flexible")
+        every_input = self.option("every")
+
+        if every_input and not flexible_input:
+            self.line("--every requires --flexible.")
+            return 1
+
+        if every_input:
+            campgrounds = [
+                Campground(id, selective=True, site_filter=site_filter)
+                for id in ids_input
+            ]
+            dates = RecurringDates(
+                date_input, flexible_input, length_input, every_input
+            )
+        elif flexible_input:
+            campgrounds = [
+                Campground(id, selective=True, site_filter=site_filter)
+                for id in ids_input
+            ]
+            dates = DateRange(date_input, flexible_input, length_input)
+        else:
+            campgrounds = [Campground(id, site_filter=site_filter) for id in ids_input]
+            dates = Dates(date_input, length_input)
+
+        if self.option("workers"):
+            max_workers = int(self.option("workers"))
+
+            if max_workers < 1:
+                self.line("Workers must be at least 1.")
+                return 1
+        else:
+            max_workers = engine.MAX_WORKERS
+
+        if self.option("cache-ttl"):
+            cache.set_default(cache.MonthCache(ttl=int(self.option("cache-ttl"))))
 
         column_width = max([len(c.name) for c in campgrounds])
 
+        if every_input:
+            return self.handle_recurring(campgrounds, dates, max_workers, column_width)
+
+        if flexible_input:
+            return self.handle_flexible(campgrounds, dates, max_workers, column_width)
+
         per_date_availability = {}
         found_available_sites = False
-        for campground in campgrounds:
-            try:
-                campground.get_available(dates.request_dates, dates.stay_dates)
-                if len(campground.available) > 0:
-                    found_available_sites = True
-
-            except (HTTPError, IndexError) as error:
+        # Campgrounds are printed in the order their data arrives.
+        for campground, error in engine.check_available(
+            campgrounds, dates, max_workers
+        ):
+            if error is not None:
                 self.line(campground.gen_cli_text(column_width, error))
                 continue
 
+            if len(campground.available) > 0:
+                found_available_sites = True
+
             self.line(campground.gen_cli_text(column_width))
 
             per_date_availability[campground.name] = campground.per_date_availability
@@ -69,17 +149,82 @@ Check if North Rim and Spring Canyon campgrounds have available sites on March 2
             dates_dict = utils.check_for_combo_availability(dates, per_date_availability)
 
             if dates_dict is not None:
+                itinerary = utils.plan_itinerary(
+                    dates.stay_ordinals, dates_dict, self.option("campground-first")
+                )
+                n_moves = len(itinerary) - 1
+                self.line(" ")
+                self.line("No contiguous availability at any one site. However, this itinerary covers every night of "
+                             f"your stay with {n_moves} change(s) of site:")
                 self.line(" ")
-                self.line("No contiguous availability at any one site. However, there are available sites each day of "
-                             "your stay:")
+                for campground, site, date, nights in itinerary:
+                    arrival = format_ordinal(date)
+                    self.line(f"<fg=cyan>{arrival}</>, {nights} night(s): <fg=magenta>{campground}</> site {site}")
                 self.line(" ")
-                for date in dates.stay_dates:
-                    self.line(f"<fg=cyan>{datetime.strptime(date, '%Y-%m-%dT00:00:00Z').strftime('%B %d, %Y')}</>")
-                    for campground in dates_dict[date]:
-                        output = ", ".join(sorted([str(int(n)) for n in dates_dict[date][campground]]))
-                        self.line(f"<fg=magenta>{campground}</>")
-                        self.line(output)
-                    self.line(" ")
+
+        if self.option("cron-mode"):
+            self.line("Not yet implemented.")
+
+        return 0
+
+    def handle_flexible(self, campgrounds, dates, max_workers, column_width) -> int:
+        """Lists every arrival date with a free site for the whole stay,
+        per campground."""
+
+        def evaluate(campground):
+            campground.get_windows(
+                dates.request_dates, dates.stay_dates, dates.length_of_stay
+            )
+
+        for campground, error in engine.check_available(
+            campgrounds, dates, max_workers, evaluate
+        ):
+            if error is not None:
+                self.line(campground.gen_cli_text(column_width, error))
+                continue
+
+            self.line(campground.gen_windows_cli_text(column_width))
+
+            for date, sites in campground.windows.items():
+                self.line(
+                    f"  <fg=cyan>{format_ordinal(date)}</>: "
+                    f"{', '.join(sites)}"
+                )
+
+        if self.option("cron-mode"):
+            self.line("Not yet implemented.")
+
+        return 0
+
+    def handle_recurring(self, campgrounds, dates, max_workers, column_width) -> int:
+        """Lists the sites free for each matching stay, grouped by
+        arrival date."""
+
+        def evaluate(campground):
+            campground.get_recurring(dates.request_dates, dates.windows)
+
+        checked = []
+        for campground, error in engine.check_available(
+            campgrounds, dates, max_workers, evaluate
+        ):
+            if error is not None:
+                self.line(campground.gen_cli_text(column_width, error))
+                continue
+
+            checked.append(campground)
+
+        for date in dates.arrival_ordinals:
+            self.line(f"<fg=cyan>{format_ordinal(date, '%A, %B %d, %Y')}</>")
+            found = False
+            for campground in checked:
+                sites = campground.recurring[date]
+                if sites:
+                    found = True
+                    self.line(f"<fg=magenta>{campground.name}</>")
+                    self.line(", ".join(sites))
+            if not found:
+                self.line("<fg=red>full</>")
+            self.line(" ")
 
         if self.option("cron-mode"):
             self.line("Not yet implemented.")
@@ -1,23 +1,34 @@
+import asyncio
 import logging
 import os
-import time
+import sqlite3
 
 import daemon
 
 from cleo import Command
 from cleo.helpers import argument, option
 
-from rgov import locations, pushsafer
-from rgov.campground import Campground
-from rgov.dates import Dates
-from rgov import utils
+from rgov import cache, control, locations, metrics, pushsafer, transport
+from rgov.commands.watch import socket_option, watch_options, watch_spec
+from rgov.poller import Poller
+from rgov.scheduler import (
+    BUDGET,
+    BURST_WINDOW,
+    INTERVAL,
+    MIN_INTERVAL,
+    Burst,
+    Scheduler,
+    parse_release,
+)
+from rgov.state import DaemonState
+from rgov.watches import Watch, load_watches
 
 
 class DaemonCommand(Command):
     name = "daemon"
     description = "Start a daemon that checks for availability automatically"
 
-    help = """The <question>daemon</> command starts a Unix daemon that checks for campground availability every five minutes. If one or more campground(s) are found to have available sites, a Pushsafer notification is sent with a summary of which campground(s) are currently available.
+    help = """The <question>daemon</> command starts a Unix daemon that checks for campground availability about every five minutes. Campgrounds whose availability keeps changing, or whose stays are coming up soon, are checked more often, down to every 30 seconds; quiet campgrounds and far-off stays are checked less often. If one or more campground(s) are found to have available sites, a Pushsafer notification is sent with a summary of which campground(s) are currently available.
 
 Note that a Pushsafer account and API key is required to use this command, and devices (e.g. a phone) must be configured for for it to work.
 
@@ -30,19 +41,87 @@ Check if North Rim Campground has available sites on February 2nd, 2022 for 3 ni
 Check if North Rim and Spring Canyon campgrounds have available sites on March 20th, 2022 for five nights:
 
     $ <info>rgov daemon 3-20-2022 5 232489 234064</>
+
+Check for any 2 night stay at North Rim Campground between June 1st and June 30th, 2022:
+
+    $ <info>rgov daemon --flexible 6-30-2022 6-1-2022 2 232489</>
+
+Check North Rim Campground every two seconds for two minutes after sites are released at 7:00 each morning, on top of the usual checks:
+
+    $ <info>rgov daemon --release 7:00 6-1-2022 2 232489</>
+
+The daemon saves its progress as it goes, so that a restarted daemon neither checks nor notifies again what it already did. Restart the last daemon's watches, including any added from a watch file:
+
+    $ <info>rgov daemon --resume</>
+
+The daemon writes how many requests it sent, how long they took, how often the cache answered and any errors to a stats file every few seconds. Read it with:
+
+    $ <info>rgov stats</>
+
+A running daemon takes commands from the <question>watch</> command, so that stays can be added, removed, paused and checked again without restarting it. Start a daemon that keeps running once every watch is done, and add to it later:
+
+    $ <info>rgov daemon --keep-running</>
+    $ <info>rgov watch add --name "north rim" 6-1-2022 2 232489</>
+
+Watch every stay listed in a watch file from a single daemon:
+
+    $ <info>rgov daemon --watch-file watches.json</>
+
+A watch file lists each stay with the same settings as the options above. Campground months wanted by several watches are fetched once per check:
+
+    {"watches": [
+        {"name": "north rim", "date": "6-1-2022", "length": 2, "ids": ["232489"],
+         "flexible": "6-30-2022", "site_type": "tent", "notify_limit": 5},
+        {"name": "spring break", "date": "3-20-2022", "length": 5,
+         "ids": ["232489", "234064"], "any_combo": true, "priority": 1}
+    ]}
 """
 
     arguments = [
-        argument("date", "The date of your arrival (mm-dd-yyyy)"),
-        argument("length", "The length of stay in nights"),
-        argument("id", "The campground id(s) to check", multiple=True),
+        argument("date", "The date of your arrival (mm-dd-yyyy)", optional=True),
+        argument("length", "The length of stay in nights", optional=True),
+        argument(
+            "id", "The campground id(s) to check", optional=True, multiple=True
+        ),
     ]
 
     options = [
         option(
-            "notify-limit",
-            "N",
-            "The number of notifications to send before the program exits [3]",
+            "watch-file",
+            "w",
+            "Watch every stay in this JSON (or TOML) file instead of the arguments",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "resume",
+            None,
+            "Also watch every stay the last daemon using the same state file was watching",
+        ),
+        option(
+            "state",
+            "s",
+            f"File to save the daemon's progress in, so it can be restarted [{locations.STATE_DB}]",
+            flag=False,
+            value_required=True,
+        ),
+        socket_option(),
+        option(
+            "keep-running",
+            "k",
+            "Keep running, taking commands, after every watch is done; may be started without any",
+        ),
+        option(
+            "stats-file",
+            None,
+            f"File to write the daemon's request and timing statistics to, read by the stats command [{locations.STATS_FILE}]",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "metrics-port",
+            None,
+            "Also serve the statistics for Prometheus at http://127.0.0.1:PORT/metrics",
             flag=False,
             value_required=True,
         ),
@@ -54,57 +133,155 @@ Check if North Rim and Spring Canyon campgrounds have available sites on March 2
             value_required=True,
         ),
         option(
-            "any-combo",
-            "a",
-            "Notify if there is any contiguous availability across different sites",
+            "interval",
+            "i",
+            f"Typical number of seconds between checks of a campground (minimum {MIN_INTERVAL}) [{INTERVAL}]",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "budget",
+            "b",
+            f"Most availability requests to send per hour [{BUDGET}]",
+            flag=False,
+            value_required=True,
         ),
         option(
-            "priority",
-            "p",
-            "Set the priority for the notification, between -2 and 2.",
+            "release",
+            "r",
+            "Local time new sites are released each day (HH:MM); check every campground every few seconds around it",
             flag=False,
             value_required=True,
         ),
         option(
-            "interval",
-            "i",
-            "Number of seconds between checking (minimum 30)",
+            "burst-window",
+            None,
+            f"Seconds to keep checking rapidly after the release [{BURST_WINDOW}]",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "cache-ttl",
+            "t",
+            f"Seconds to reuse fetched availability, 0 to disable [{cache.DEFAULT_TTL}]",
             flag=False,
             value_required=True,
         ),
+        *watch_options(),
     ]
 
     def handle(self) -> int:
         id_input = self.argument("id")
         date_input = self.argument("date")
         length_input = self.argument("length")
-        any_combo = self.option("any-combo")
+        watch_file = self.option("watch-file")
+
+        if self.option("interval"):
+            interval = int(self.option("interval"))
 
-        if self.option("notify-limit"):
-            notify_limit = int(self.option("notify-limit"))
+            if (interval) < MIN_INTERVAL:
+                self.line(f"Interval must be greater than {MIN_INTERVAL}.")
+                return 1
         else:
-            notify_limit = 3
+            interval = INTERVAL
 
-        if self.option("priority"):
-            priority = int(self.option("priority"))
+        if self.option("budget"):
+            budget = int(self.option("budget"))
 
-            if priority > 2 or priority < -2:
-                self.line("Priority should be between -2 and 2.")
+            if budget < 1:
+                self.line("Budget must be at least 1.")
                 return 1
         else:
-            priority = 0
+            budget = BUDGET
 
-        if self.option("interval"):
-            interval = int(self.option("interval"))
+        if self.option("release"):
+            try:
+                release = parse_release(self.option("release"))
+            except ValueError as error:
+                self.line(str(error))
+                return 1
+        else:
+            release = None
+
+        if self.option("burst-window"):
+            burst_window = int(self.option("burst-window"))
+
+            if burst_window < 1:
+                self.line("Burst window must be at least 1.")
+                return 1
+        else:
+            burst_window = BURST_WINDOW
+
+        if self.option("cache-ttl"):
+            cache.set_default(cache.MonthCache(ttl=int(self.option("cache-ttl"))))
 
-            if (interval) < 30:
-                self.line("Interval must be greater than 30.")
+        state_path = self.option("state") or locations.STATE_DB
+        stats_path = self.option("stats-file") or locations.STATS_FILE
+        control_path = self.option("socket") or locations.CONTROL_SOCKET
+        keep_running = self.option("keep-running")
+
+        if self.option("metrics-port"):
+            metrics_port = int(self.option("metrics-port"))
+
+            if not 0 < metrics_port < 65536:
+                self.line("Metrics port must be between 1 and 65535.")
                 return 1
         else:
-            interval = 300  # wait 5 minutes before checking again
+            metrics_port = None
+
+        watches = []
+        if watch_file:
+            try:
+                watches = load_watches(watch_file)
+            except (OSError, ValueError) as error:
+                self.line(str(error))
+                return 1
+        elif date_input or length_input or id_input:
+            if not (date_input and length_input and id_input):
+                self.line("Give a date, length and campground id(s).")
+                return 1
 
-        dates = Dates(date_input, length_input)
-        campgrounds = [Campground(id) for id in id_input]
+            watch = self.watch_from_options()
+            if watch is None:
+                return 1
+            watches = [watch]
+        elif not (self.option("resume") or keep_running):
+            self.line(
+                "Give a date, length and campground id(s), --watch-file, --resume "
+                "or --keep-running."
+            )
+            return 1
+
+        if self.option("resume"):
+            state = DaemonState(state_path)
+            try:
+                specs = state.watch_specs()
+            except sqlite3.Error as error:
+                self.line(f"Could not read {state_path}: {error}")
+                return 1
+            finally:
+                state.close()
+
+            names = {watch.name for watch in watches}
+            for spec in specs:
+                if spec is None or spec.get("name") in names:
+                    continue
+                try:
+                    watches.append(Watch.from_spec(spec))
+                except ValueError as error:
+                    self.line(f"Not resuming {spec.get('name')}: {error}")
+
+        if not watches and not keep_running:
+            self.line("No watches to check.")
+            return 1
+
+        try:
+            control.send(control_path, {"command": "list"}, timeout=5)
+        except control.ControlError:
+            pass
+        else:
+            self.line(f"A daemon is already running on {control_path}.")
+            return 1
 
         # make sure the api key works
         if os.path.exists(locations.AUTH_FILE):
@@ -124,7 +301,12 @@ Check if North Rim and Spring Canyon campgrounds have available sites on March 2
                     pushsafer.write_credentials(ps_username, ps_api_key)
 
         self.line("<fg=magenta>Starting to check.</fg=magenta>")
-        with daemon.DaemonContext():
+        # The daemon closes every file descriptor, so a pooled
+        # connection kept open now would be reused on a closed (or
+        # worse, reassigned) descriptor.
+        transport.close()
+        # The state, stats and control socket are the user's alone.
+        with daemon.DaemonContext(umask=0o077):
             logging.basicConfig(
                 filename=locations.LOG_FILE,
                 filemode="a",
@@ -132,91 +314,52 @@ Check if North Rim and Spring Canyon campgrounds have available sites on March 2
                 datefmt="%Y/%d/%m %H:%M:%S",
                 level=logging.INFO,
             )
-            logging.info("starting to search")
+            logging.info(f"starting to search for {len(watches)} watch(es)")
 
-            notification_counter = 0
-
-            while True:
-                logging.info("------------checking------------")
-
-                available = {}
-                per_date_availability = {}
-                found_available_sites = False
-                for campground in campgrounds:
-                    try:
-                        campground.get_available(dates.request_dates, dates.stay_dates)
-
-                    except Exception as error:
-                        logging.error(error)
-                        time.sleep(10)
-                        continue
-
-                    per_date_availability[campground.name] = (
-                        campground.per_date_availability
-                    )
-
-                    if len(campground.available) > 0:
-                        logging.info(f"{campground.name} - found available site(s)")
-                        available[campground.name] = campground.available
-                        found_available_sites = True
-                    else:
-                        logging.info(f"{campground.name} - no available site(s)")
-
-                    if campground != campgrounds[-1]:
-                        time.sleep(1)
-
-                if available:
-                    message = pushsafer.gen_notifier_text(available)
-
-                    pushsafer_status = pushsafer.notify(
-                        ps_api_key, "a", message, critical
-                    )
-
-                    if pushsafer_status["status"] == 0:
-                        logging.error(f"Pushsafer: {pushsafer_status}")
-                    else:
-                        logging.info(f"Pushsafer: {pushsafer_status}")
-
-                    notification_counter += 1
-
-                elif any_combo:
-                    logging.info(
-                        f"Checking for cross-site/cross-campground availability"
-                    )
-
-                    dates_dict = utils.check_for_combo_availability(
-                        dates, per_date_availability
-                    )
-
-                    if dates_dict is not None:
-                        logging.info(
-                            f"Found availability accross sites. Sending pushsafer notification"
-                        )
-
-                        message = pushsafer.gen_any_combo_notifier_text(
-                            dates_dict, dates.stay_dates
-                        )
-
-                        pushsafer_status = pushsafer.notify(
-                            ps_api_key, "a", message, critical
-                        )
-
-                        if pushsafer_status["status"] == 0:
-                            logging.error(f"Pushsafer: {pushsafer_status}")
-                        else:
-                            logging.info(f"Pushsafer: {pushsafer_status}")
-
-                        notification_counter += 1
-
-                if notification_counter == notify_limit:
-                    reached_notify_limit = (
-                        "notification limit reached "
-                        f"[{notification_counter}/"
-                        f"{notify_limit}] - exiting"
-                    )
+            if release is not None:
+                burst = Burst(release, window=burst_window)
+            else:
+                burst = None
+            if metrics_port is not None:
+                try:
+                    metrics.serve(metrics_port)
+                except OSError as error:
+                    logging.error(f"could not serve metrics on {metrics_port}: {error}")
+            state = DaemonState(state_path)
+            poller = Poller(
+                Scheduler(interval, budget),
+                ps_api_key,
+                burst,
+                state=state,
+                stats_path=stats_path,
+                control_path=control_path,
+                keep_running=keep_running,
+            )
+            for watch in watches:
+                poller.add_watch(watch)
 
-                    logging.info(reached_notify_limit)
+            try:
+                restored = state.restore(poller)
+            except sqlite3.Error as error:
+                logging.error(f"could not restore {state_path}: {error}")
+            else:
+                if restored:
+                    logging.info(f"resumed {len(restored)} watch(es)")
 
-                    return 0
+            asyncio.run(poller.run())
 
-                time.sleep(interval)
+            if poller.watches or keep_running:
+                logging.info("stopped - exiting")
+            else:
+                logging.info("every watch reached its notification limit - exiting")
+
+            return 0
+
+    def watch_from_options(self):
+        """Builds the single Watch described by the command line, or
+        returns None if an option is invalid."""
+        try:
+            return Watch.from_spec(watch_spec(self))
+        except ValueError as error:
+            self.line(str(error))
+            return None
@@ -0,0 +1,151 @@
+import datetime
+import time
+from collections import defaultdict
+
+from cleo import Command
+from cleo.helpers import option
+
+from rgov import locations, metrics
+
+
+def _duration(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms"
+
+
+class StatsCommand(Command):
+    name = "stats"
+    description = "Show the statistics of a running daemon"
+
+    options = [
+        option(
+            "file",
+            "f",
+            f"The stats file the daemon writes to [{locations.STATS_FILE}]",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "prometheus",
+            None,
+            "Print the statistics in the Prometheus text format",
+        ),
+    ]
+
+    help = """The <question>stats</> command shows what a daemon has been doing since it started: the requests it sent and how long they took, how much was downloaded, how often the cache answered, how long parsing and each check of a campground took, the errors it ran into and the notifications it sent.
+
+The daemon rewrites its stats file every few seconds, and once more when it exits.
+
+<options=bold>Examples:</>
+
+Show the statistics of the daemon using the default stats file:
+
+    $ <info>rgov stats</>
+
+Print them for a Prometheus textfile collector:
+
+    $ <info>rgov stats --prometheus > /var/lib/node_exporter/rgov.prom</>
+"""
+
+    def handle(self) -> int:
+        path = self.option("file") or locations.STATS_FILE
+
+        try:
+            stats = metrics.read_stats(path)
+        except (OSError, ValueError) as error:
+            self.line(f"Could not read {path}: {error}")
+            return 1
+
+        if self.option("prometheus"):
+            self.io.write(metrics.render_prometheus(stats))
+            return 0
+
+        now = time.time()
+        self.line(
+            f"<info>Written {_duration(now - stats['written_at'])} ago, "
+            f"{_duration(stats['written_at'] - stats['started_at'])} after the "
+            "daemon started.</>"
+        )
+
+        counters = defaultdict(list)
+        counters.update(stats["counters"])
+        histograms = defaultdict(list)
+        histograms.update(stats["histograms"])
+
+        self.line("")
+        self.line("<options=bold>Requests</>")
+        statuses = defaultdict(dict)
+        for s in counters["requests"]:
+            statuses[s["labels"]["host"]][s["labels"]["status"]] = s["value"]
+        downloaded = defaultdict(dict)
+        for s in counters["bytes"]:
+            downloaded[s["labels"]["host"]][s["labels"]["kind"]] = s["value"]
+        latency = {s["labels"]["host"]: s for s in histograms["request_seconds"]}
+        for host, by_status in sorted(statuses.items()):
+            counts = ", ".join(f"{n} {status}" for status, n in sorted(by_status.items()))
+            self.line(f"  {host}: {sum(by_status.values())} ({counts})")
+            if host in latency:
+                self.line(f"    latency: {self.summary(latency[host])}")
+            if host in downloaded:
+                wire = downloaded[host].get("wire", 0)
+                decoded = downloaded[host].get("decoded", 0)
+                self.line(f"    received: {wire} bytes ({decoded} bytes decoded)")
+
+        if histograms["month_seconds"]:
+            self.line("")
+            self.line("<options=bold>Month requests by campground</>")
+            for s in histograms["month_seconds"]:
+                self.line(f"  {s['labels']['campground']}: {self.summary(s)}")
+
+        cache = {s["labels"]["result"]: s["value"] for s in counters["cache"]}
+        lookups = sum(cache.values())
+        if lookups:
+            hits = cache.get("hit", 0) + cache.get("revalidated", 0)
+            self.line("")
+            self.line("<options=bold>Month cache</>")
+            self.line(
+                f"  {hits / lookups:.0%} answered without downloading "
+                f"({cache.get('hit', 0)} fresh, {cache.get('revalidated', 0)} "
+                f"revalidated, {cache.get('miss', 0)} downloaded)"
+            )
+
+        if histograms["parse_seconds"]:
+            self.line("")
+            self.line("<options=bold>Parsing</>")
+            self.line(f"  {self.summary(histograms['parse_seconds'][0])}")
+
+        if histograms["poll_seconds"]:
+            self.line("")
+            self.line("<options=bold>Checks by campground</>")
+            for s in histograms["poll_seconds"]:
+                self.line(f"  {s['labels']['campground']}: {self.summary(s)}")
+
+        self.line("")
+        self.line("<options=bold>Errors</>")
+        if not counters["errors"]:
+            self.line("  none")
+        for s in counters["errors"]:
+            self.line(f"  {s['labels']['type']}: {s['value']}")
+
+        self.line("")
+        self.line("<options=bold>Notifications</>")
+        if not counters["notifications"]:
+            self.line("  none")
+        for s in counters["notifications"]:
+            self.line(f"  {s['labels']['watch']}: {s['value']} {s['labels']['result']}")
+
+        return 0
+
+    def summary(self, histogram: dict) -> str:
+        count = histogram["count"]
+        if count == 0:
+            return "0 timed"
+        buckets = histogram["buckets"]
+        return (
+            f"{count} timed, mean {_ms(histogram['sum'] / count)}, "
+            f"p50 {_ms(metrics.quantile(buckets, count, 0.5))}, "
+            f"p95 {_ms(metrics.quantile(buckets, count, 0.95))}"
+        )
@@ -0,0 +1,321 @@
+from cleo import Command
+from cleo.helpers import argument, option
+
+from rgov import control, locations
+
+
+def socket_option():
+    return option(
+        "socket",
+        "S",
+        f"The socket the daemon takes commands on [{locations.CONTROL_SOCKET}]",
+        flag=False,
+        value_required=True,
+    )
+
+
+# Spec keys set from the option of the same name, when given.
+SEARCH_OPTIONS = ("flexible", "site-type", "loop", "party-size", "sites")
+WATCH_OPTIONS = ("notify-limit", "priority")
+
+
+def search_options():
+    """The options narrowing down which stays and sites are wanted,
+    shared by the commands that search for availability."""
+    return [
+        option(
+            "flexible",
+            "f",
+            "Find any stay of the given length from the arrival date up to this last night (mm-dd-yyyy)",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "campground-first",
+            None,
+            "When combining sites, keep campground changes to a minimum before site changes",
+        ),
+        option(
+            "site-type",
+            None,
+            "Only sites whose type contains this (e.g. tent)",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "loop",
+            None,
+            "Only sites in this loop",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "party-size",
+            None,
+            "Only sites allowing at least this many people",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "sites",
+            None,
+            "Only these site numbers, comma separated",
+            flag=False,
+            value_required=True,
+        ),
+    ]
+
+
+def watch_options():
+    """The options describing a watch, shared by the commands that
+    start one."""
+    return [
+        option(
+            "notify-limit",
+            "N",
+            "The number of notifications to send before the watch is dropped [3]",
+            flag=False,
+            value_required=True,
+        ),
+        option(
+            "any-combo",
+            "a",
+            "Notify if there is any contiguous availability across different sites",
+        ),
+        option(
+            "priority",
+            "p",
+            "Set the priority for the notification, between -2 and 2.",
+            flag=False,
+            value_required=True,
+        ),
+        *search_options(),
+    ]
+
+
+def search_spec(command: Command) -> dict:
+    """Returns the part of a watch spec, as read by Watch.from_spec,
+    set by the search_options of command."""
+    spec = {"campground_first": command.option("campground-first")}
+    for option_name in SEARCH_OPTIONS:
+        if command.option(option_name):
+            spec[option_name.replace("-", "_")] = command.option(option_name)
+    return spec
+
+
+def watch_spec(command: Command, name=None) -> dict:
+    """Builds a watch spec, as read by Watch.from_spec, from the date,
+    length and id arguments and the watch_options of command. The watch
+    is named after the date unless name is given."""
+    date_input = command.argument("date")
+    spec = {
+        "name": name or date_input,
+        "date": date_input,
+        "length": command.argument("length"),
+        "ids": command.argument("id"),
+        "any_combo": command.option("any-combo"),
+        **search_spec(command),
+    }
+    for option_name in WATCH_OPTIONS:
+        if command.option(option_name):
+            spec[option_name.replace("-", "_")] = command.option(option_name)
+    return spec
+
+
+def _wait(seconds) -> str:
+    if seconds is None:
+        return "not scheduled"
+    if seconds < 1:
+        return "due now"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"next check in {minutes}m {seconds}s" if minutes else f"next check in {seconds}s"
+
+
+class ControlCommand(Command):
+    def send(self, request: dict):
+        """Sends a request to the daemon and returns its reply, or None
+        after reporting why it failed."""
+        path = self.option("socket") or locations.CONTROL_SOCKET
+        try:
+            return control.send(path, request)
+        except control.ControlError as error:
+            self.line(f"<error>{error}</>")
+            return None
+
+    def describe(self, watch: dict) -> str:
+        spec = watch["spec"] or {}
+        ids = spec.get("ids", [])
+        if isinstance(ids, str):
+            ids = [ids]
+        line = f"<info>{watch['name']}</> [<question>{', '.join(ids)}</>]"
+        if spec.get("date"):
+            line += f" {spec['date']}, {spec.get('length')} night(s)"
+            if spec.get("flexible"):
+                line += f" through {spec['flexible']}"
+        line += (
+            f" - {watch['notifications']}/{watch['notify_limit']} notification(s)"
+        )
+        if watch["paused"]:
+            return line + ", <comment>paused</>"
+        waits = [w for w in watch["next_poll"].values() if w is not None]
+        return line + f", {_wait(min(waits) if waits else None)}"
+
+
+class WatchAddCommand(ControlCommand):
+    name = "add"
+    description = "Add a watch to the running daemon"
+    arguments = [
+        argument("date", "The date of your arrival (mm-dd-yyyy)"),
+        argument("length", "The length of stay in nights"),
+        argument("id", "The campground id(s) to check", multiple=True),
+    ]
+    options = [
+        option(
+            "name",
+            None,
+            "Name to refer to the watch by [the date]",
+            flag=False,
+            value_required=True,
+        ),
+        *watch_options(),
+        socket_option(),
+    ]
+
+    def handle(self) -> int:
+        spec = watch_spec(self, self.option("name"))
+        reply = self.send({"command": "add", "spec": spec})
+        if reply is None:
+            return 1
+        self.line(self.describe(reply["watch"]))
+        return 0
+
+
+class WatchRemoveCommand(ControlCommand):
+    name = "remove"
+    description = "Stop watching and forget a watch"
+    arguments = [argument("name", "The name of the watch")]
+    options = [socket_option()]
+
+    def handle(self) -> int:
+        if self.send({"command": "remove", "name": self.argument("name")}) is None:
+            return 1
+        self.line(f"Removed {self.argument('name')}.")
+        return 0
+
+
+class WatchPauseCommand(ControlCommand):
+    name = "pause"
+    description = "Stop checking a watch until it is resumed"
+    arguments = [argument("name", "The name of the watch")]
+    options = [socket_option()]
+
+    def handle(self) -> int:
+        reply = self.send({"command": "pause", "name": self.argument("name")})
+        if reply is None:
+            return 1
+        self.line(self.describe(reply["watch"]))
+        return 0
+
+
+class WatchResumeCommand(ControlCommand):
+    name = "resume"
+    description = "Resume checking a paused watch"
+    arguments = [argument("name", "The name of the watch")]
+    options = [socket_option()]
+
+    def handle(self) -> int:
+        reply = self.send({"command": "resume", "name": self.argument("name")})
+        if reply is None:
+            return 1
+        self.line(self.describe(reply["watch"]))
+        return 0
+
+
+class WatchListCommand(ControlCommand):
+    name = "list"
+    description = "List the watches of the running daemon"
+    options = [socket_option()]
+
+    def handle(self) -> int:
+        reply = self.send({"command": "list"})
+        if reply is None:
+            return 1
+        if not reply["watches"]:
+            self.line("No watches.")
+        for watch in reply["watches"]:
+            self.line(self.describe(watch))
+        return 0
+
+
+class WatchPollCommand(ControlCommand):
+    name = "poll"
+    description = "Check a watch's campgrounds, or every campground, now"
+    arguments = [argument("name", "The name of the watch", optional=True)]
+    options = [socket_option()]
+
+    def handle(self) -> int:
+        request = {"command": "poll"}
+        if self.argument("name"):
+            request["name"] = self.argument("name")
+        reply = self.send(request)
+        if reply is None:
+            return 1
+        self.line(f"Checking {reply['campgrounds']} campground(s).")
+        return 0
+
+
+class WatchStopCommand(ControlCommand):
+    name = "stop"
+    description = "Stop the running daemon"
+    options = [socket_option()]
+
+    def handle(self) -> int:
+        if self.send({"command": "stop"}) is None:
+            return 1
+        self.line("Stopping.")
+        return 0
+
+
+class WatchCommand(Command):
+    name = "watch"
+    description = "Change what a running daemon watches"
+
+    help = """The <question>watch</> command changes what a running <question>daemon</> watches without restarting it, so that it keeps its open connections and cached availability. Its sub-commands talk to the daemon over a Unix socket.
+
+<options=bold>Examples:</>
+
+Add a watch for North Rim Campground on June 1st, 2022 for 2 nights:
+
+    $ <info>rgov watch add --name "north rim" 6-1-2022 2 232489</>
+
+List the daemon's watches and when each is checked next:
+
+    $ <info>rgov watch list</>
+
+Stop checking a watch for now, then pick it up again:
+
+    $ <info>rgov watch pause "north rim"</>
+    $ <info>rgov watch resume "north rim"</>
+
+Check every campground straight away:
+
+    $ <info>rgov watch poll</>
+
+Stop watching a stay, or stop the daemon altogether:
+
+    $ <info>rgov watch remove "north rim"</>
+    $ <info>rgov watch stop</>
+"""
+
+    commands = [
+        WatchAddCommand(),
+        WatchRemoveCommand(),
+        WatchPauseCommand(),
+        WatchResumeCommand(),
+        WatchListCommand(),
+        WatchPollCommand(),
+        WatchStopCommand(),
+    ]
+
+    def handle(self) -> int:
+        return self.call("help", self.name)
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+
+from rgov.watches import Watch
+
+# Seconds a client waits for the daemon to answer.
+TIMEOUT = 30
+
+
+class ControlError(Exception):
+    """The daemon refused a command, or couldn't be reached."""
+
+
+def describe(poller, watch) -> dict:
+    """Returns what the list command reports about a watch."""
+    next_poll = {}
+    for id_num in watch.ids:
+        if id_num in poller.scheduler:
+            next_poll[id_num] = poller.scheduler.wait(id_num)
+        else:
+            next_poll[id_num] = None
+    return {
+        "name": watch.name,
+        "spec": watch.spec,
+        "paused": watch.paused,
+        "notifications": watch.notifications,
+        "notify_limit": watch.notify_limit,
+        "next_poll": next_poll,
+    }
+
+
+class ControlServer:
+    """Takes commands for a running Poller on a Unix socket, so that
+    watches can be changed without restarting the daemon and losing its
+    connections and caches.
+
+    A client connects, sends one JSON object on a line and reads one
+    back. Requests name a command, e.g. {"command": "pause", "name":
+    "north rim"}, and replies hold "ok" and, if it is false, "error".
+    Commands run on the poller's event loop, between its other steps,
+    so they never see it half way through a change."""
+
+    def __init__(self, poller, path):
+        self.poller = poller
+        self.path = path
+        self._server = None
+
+    async def start(self):
+        # Only the owner may connect to the socket, or replace it.
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        # A socket left behind by a daemon that didn't exit cleanly.
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(umask)
+        self._server = await asyncio.start_unix_server(self._handle, sock=sock)
+        logging.info(f"taking commands on {self.path}")
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader, writer):
+        try:
+            line = await reader.readline()
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("A request must be a JSON object.")
+                reply = await self.dispatch(request)
+            except ValueError as error:
+                reply = {"ok": False, "error": str(error)}
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: dict) -> dict:
+        """Runs a request and returns the reply. Raises ValueError if
+        the request is invalid."""
+        command = request.get("command")
+        handler = getattr(self, f"do_{command}", None)
+        if handler is None:
+            raise ValueError(f'Unknown command "{command}".')
+        logging.info(f"control: {command} {request.get('name') or ''}".rstrip())
+        reply = await handler(request)
+        if command != "list":
+            self.poller.checkpoint()
+        return dict(reply, ok=True)
+
+    def _watch(self, request):
+        name = request.get("name")
+        watch = self.poller.find_watch(name)
+        if watch is None:
+            raise ValueError(f'No watch named "{name}".')
+        return watch
+
+    async def _evaluate_ready(self, watch):
+        """Evaluates a watch straight away against any months already
+        held for it, rather than at the next poll."""
+        ready = [c for c in watch.campgrounds if c in self.poller.ready]
+        if ready:
+            await self.poller.evaluate(ready)
+
+    async def do_list(self, request):
+        return {"watches": [describe(self.poller, w) for w in self.poller.watches]}
+
+    async def do_add(self, request):
+        spec = request.get("spec")
+        if not isinstance(spec, dict):
+            raise ValueError("Give the watch to add as a spec.")
+        watch = Watch.from_spec(spec)
+        if not watch.name:
+            raise ValueError("A watch added to a running daemon needs a name.")
+        if self.poller.find_watch(watch.name) is not None:
+            raise ValueError(f'A watch named "{watch.name}" already exists.')
+        self.poller.add_watch(watch)
+        await self._evaluate_ready(watch)
+        return {"watch": describe(self.poller, watch)}
+
+    async def do_remove(self, request):
+        self.poller.remove_watch(self._watch(request))
+        return {}
+
+    async def do_pause(self, request):
+        watch = self._watch(request)
+        self.poller.pause_watch(watch)
+        return {"watch": describe(self.poller, watch)}
+
+    async def do_resume(self, request):
+        watch = self._watch(request)
+        self.poller.resume_watch(watch)
+        await self._evaluate_ready(watch)
+        return {"watch": describe(self.poller, watch)}
+
+    async def do_poll(self, request):
+        """Polls the campgrounds of the named watch, or every campground
+        if no name is given, now."""
+        if request.get("name"):
+            watch = self._watch(request)
+            if watch.paused:
+                raise ValueError(f'"{watch.name}" is paused.')
+            ids = list(dict.fromkeys(watch.ids))
+        else:
+            ids = list(self.poller.fetches)
+        for id_num in ids:
+            self.poller.poll_now(id_num)
+        return {"campgrounds": len(ids)}
+
+    async def do_stop(self, request):
+        self.poller.stop()
+        return {}
+
+
+def send(path: str, request: dict, timeout=TIMEOUT) -> dict:
+    """Sends a request to the daemon listening on path and returns its
+    reply. Raises ControlError if the daemon can't be reached or
+    refuses the request."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        except OSError as error:
+            raise ControlError(f"Could not reach a daemon at {path}: {error}")
+
+    try:
+        reply = json.loads(line)
+    except ValueError:
+        raise ControlError(f"The daemon at {path} sent an invalid reply.")
+    if not reply.get("ok"):
+        raise ControlError(reply.get("error", "The daemon refused the command."))
+    return reply
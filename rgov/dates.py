@@ -1,12 +1,23 @@
 import datetime
 
 
+def to_ordinal(date: str) -> int:
+    """Converts a stay date ("%Y-%m-%dT00:00:00Z") to a day ordinal."""
+    return datetime.date(int(date[:4]), int(date[5:7]), int(date[8:10])).toordinal()
+
+
+def format_ordinal(ordinal: int, fmt="%B %d, %Y") -> str:
+    """Formats a day ordinal for display."""
+    return datetime.date.fromordinal(ordinal).strftime(fmt)
+
+
 class Dates:
     def __init__(self, arrival_date, length_of_stay):
         self._arrival_date = self.__validate_date(arrival_date)
         self.length_of_stay = self.__validate_length(length_of_stay)
         self._request_dates = None
         self._stay_dates = None
+        self._stay_ordinals = None
 
     def __validate_date(self, date):
         """Validates the given date and returns it as a datetime
@@ -58,3 +69,144 @@ class Dates:
                 stay_dates.append(date)
             self._stay_dates = stay_dates
             return self._stay_dates
+
+    @property
+    def stay_ordinals(self):
+        """stay_dates as day ordinals."""
+        if self._stay_ordinals is not None:
+            return self._stay_ordinals
+        else:
+            self._stay_ordinals = [to_ordinal(date) for date in self.stay_dates]
+            return self._stay_ordinals
+
+
+class DateRange(Dates):
+    """A flexible stay: any length_of_stay consecutive nights between
+    arrival_date and end_date, the last night that may be booked."""
+
+    def __init__(self, arrival_date, end_date, length_of_stay):
+        super().__init__(arrival_date, length_of_stay)
+        self._end_date = Dates(end_date, length_of_stay)._arrival_date
+        last_arrival = self._end_date - datetime.timedelta(
+            days=self.length_of_stay - 1
+        )
+        if last_arrival < self._arrival_date:
+            raise ValueError(
+                f'"{end_date}" leaves no room for a '
+                f"{self.length_of_stay} night stay."
+            )
+        self._arrival_dates = None
+
+    @property
+    def request_dates(self):
+        if self._request_dates is not None:
+            return self._request_dates
+        else:
+            dates = []
+            month = self._arrival_date.replace(day=1)
+            while month <= self._end_date:
+                dates.append(month.strftime("%Y-%m-%dT00:00:00.000Z"))
+                if month.month == 12:
+                    month = month.replace(year=month.year + 1, month=1)
+                else:
+                    month = month.replace(month=month.month + 1)
+            self._request_dates = dates
+            return self._request_dates
+
+    @property
+    def stay_dates(self):
+        """Every night in the range."""
+        if self._stay_dates is not None:
+            return self._stay_dates
+        else:
+            stay_dates = []
+            n_nights = (self._end_date - self._arrival_date).days + 1
+            for i in range(n_nights):
+                date = self._arrival_date + datetime.timedelta(days=i)
+                date = date.strftime("%Y-%m-%dT00:00:00Z")
+                stay_dates.append(date)
+            self._stay_dates = stay_dates
+            return self._stay_dates
+
+    @property
+    def arrival_dates(self):
+        """Every possible arrival date, in the same format as
+        stay_dates."""
+        if self._arrival_dates is not None:
+            return self._arrival_dates
+        else:
+            n_arrivals = len(self.stay_dates) - self.length_of_stay + 1
+            self._arrival_dates = self.stay_dates[:n_arrivals]
+            return self._arrival_dates
+
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+class RecurringDates:
+    """Every stay of length_of_stay nights arriving on the given weekday
+    (e.g. "fri") from arrival_date up to end_date, the last night that
+    may be booked."""
+
+    def __init__(self, arrival_date, end_date, length_of_stay, weekday):
+        self._range = DateRange(arrival_date, end_date, length_of_stay)
+        self.length_of_stay = self._range.length_of_stay
+        self.weekday = self.__validate_weekday(weekday)
+        self._windows = None
+        self._stay_dates = None
+        if not self.windows:
+            raise ValueError(
+                f'No {length_of_stay} night stay arriving on "{weekday}" '
+                "fits in the range."
+            )
+
+    def __validate_weekday(self, weekday):
+        """Validates the given weekday name and returns its number,
+        Monday being 0."""
+        try:
+            return WEEKDAYS.index(str(weekday).lower()[:3])
+        except ValueError:
+            raise ValueError(f'"{weekday}" is not a day of the week.')
+
+    @property
+    def request_dates(self):
+        return self._range.request_dates
+
+    @property
+    def windows(self):
+        """The stay dates of every matching stay, in order."""
+        if self._windows is not None:
+            return self._windows
+        else:
+            nights = self._range.stay_dates
+            first = self._range._arrival_date
+            windows = []
+            for i in range(len(self._range.arrival_dates)):
+                arrival = first + datetime.timedelta(days=i)
+                if arrival.weekday() == self.weekday:
+                    windows.append(nights[i : i + self.length_of_stay])
+            self._windows = windows
+            return self._windows
+
+    @property
+    def arrival_dates(self):
+        return [window[0] for window in self.windows]
+
+    @property
+    def stay_dates(self):
+        """Every night of every matching stay."""
+        if self._stay_dates is not None:
+            return self._stay_dates
+        else:
+            self._stay_dates = list(
+                dict.fromkeys(date for window in self.windows for date in window)
+            )
+            return self._stay_dates
+
+    @property
+    def stay_ordinals(self):
+        return [to_ordinal(date) for date in self.stay_dates]
+
+    @property
+    def arrival_ordinals(self):
+        return [to_ordinal(date) for date in self.arrival_dates]
@@ -0,0 +1,85 @@
+from collections import defaultdict
+
+
+class Change:
+    """What changed in a snapshot since the previous one: new and lost
+    have the shape of the results passed to SnapshotDiff.update, i.e. a
+    list of site labels or {arrival date: [site labels]}."""
+
+    __slots__ = ("key", "new", "lost")
+
+    def __init__(self, key, new, lost):
+        self.key = key
+        self.new = new
+        self.lost = lost
+
+
+def _items(found) -> frozenset:
+    if isinstance(found, dict):
+        return frozenset(
+            (date, site) for date, sites in found.items() for site in sites
+        )
+    return frozenset(found)
+
+
+def _shape(items: frozenset, windows: bool):
+    if not windows:
+        return sorted(items)
+    grouped = defaultdict(list)
+    for date, site in sorted(items):
+        grouped[date].append(site)
+    return dict(grouped)
+
+
+class SnapshotDiff:
+    """Remembers the last results seen for each key, typically a
+    campground, so that repeated polls only report what changed.
+
+    Each snapshot is stored with a fingerprint of the data it was
+    computed from, such as Campground.fingerprint. A snapshot with the
+    same fingerprint as the last one is unchanged and is dismissed
+    without looking at its results."""
+
+    def __init__(self):
+        # {key: (fingerprint, items)}
+        self._snapshots = {}
+
+    def __contains__(self, key) -> bool:
+        return key in self._snapshots
+
+    def update(self, key, fingerprint, found):
+        """Records found, a list of site labels or {date: [site labels]},
+        as the latest snapshot for key. Returns a Change holding the
+        sites that appeared and disappeared since the last snapshot, or
+        None if there are none. Everything is new the first time a key
+        is seen."""
+        last = self._snapshots.get(key)
+        if last is not None and last[0] == fingerprint:
+            return None
+
+        items = _items(found)
+        old = last[1] if last is not None else frozenset()
+        self._snapshots[key] = (fingerprint, items)
+        new = items - old
+        lost = old - items
+        if not new and not lost:
+            return None
+
+        windows = isinstance(found, dict)
+        return Change(key, _shape(new, windows), _shape(lost, windows))
+
+    def forget(self, key):
+        """Drops the snapshot for key, so that its next results are all
+        new."""
+        self._snapshots.pop(key, None)
+
+    def snapshots(self) -> list:
+        """Returns (key, items) for every snapshot, where items is a
+        frozenset of site labels or of (date, site label) pairs."""
+        return [(key, items) for key, (_, items) in self._snapshots.items()]
+
+    def restore(self, key, items):
+        """Restores a snapshot saved from snapshots(). Its fingerprint
+        is unknown, so the next results for key are compared site by
+        site."""
+        self._snapshots[key] = (None, frozenset(items))
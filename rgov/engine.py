@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Generator
+from urllib.error import URLError
+
+from rgov.campground import Campground
+from rgov.dates import Dates
+
+# Upper bound on the number of month documents in flight at once across
+# all campgrounds being checked.
+MAX_WORKERS = 8
+
+
+def fetch(plan: dict, max_workers=MAX_WORKERS) -> Generator[
+    tuple[Campground, Exception], None, None
+]:
+    """Fetches the months of every campground in plan, which maps each
+    campground to the (request_dates, stay_dates) it must be able to
+    answer, concurrently. Yields (campground, error) as soon as all of
+    a campground's months have arrived, or as soon as one of them
+    fails; error is None on success. Each campground appears in plan
+    once, so a month wanted by several queries is fetched only once."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        remaining = {}
+        for campground, (request_dates, stay_dates) in plan.items():
+            # Only months the campground doesn't already hold fresh.
+            stale = campground.stale_months(request_dates, stay_dates)
+            if not stale:
+                yield campground, None
+                continue
+            remaining[id(campground)] = len(stale)
+            for date in stale:
+                future = executor.submit(campground.fetch_month, date, stay_dates)
+                futures[future] = (campground, date, stay_dates)
+
+        for future in as_completed(futures):
+            campground, date, stay_dates = futures[future]
+            key = id(campground)
+            if key not in remaining:
+                # An earlier month of this campground already failed.
+                continue
+
+            try:
+                campground.store_month(date, future.result(), stay_dates)
+            except (URLError, KeyError, ValueError) as error:
+                del remaining[key]
+                yield campground, error
+                continue
+
+            remaining[key] -= 1
+            if remaining[key] == 0:
+                del remaining[key]
+                yield campground, None
+
+
+def check_available(
+    campgrounds: list, dates: Dates, max_workers=MAX_WORKERS, evaluate=None
+) -> Generator[tuple[Campground, Exception], None, None]:
+    """Fetches every (campground, month) pair concurrently and yields
+    (campground, error) as soon as all of a campground's months have
+    arrived, or as soon as one of them fails. error is None on success,
+    in which case evaluate(campground) has been called; by default it
+    computes the campground's availability for dates."""
+    request_dates = dates.request_dates
+    stay_dates = dates.stay_dates
+    if evaluate is None:
+        evaluate = lambda c: c.get_available(request_dates, stay_dates)
+
+    plan = {campground: (request_dates, stay_dates) for campground in campgrounds}
+    for campground, error in fetch(plan, max_workers):
+        if error is None:
+            evaluate(campground)
+        yield campground, error
@@ -19,4 +19,14 @@ CONFIG_DIR = os.getenv("XDG_CONFIG_HOME", os.path.join(Path.home(), ".config"))
 AUTH_FILE = os.path.join(CONFIG_DIR, "rgov", "auth.txt")
 LOG_FILE = os.path.join(Path.home(), ".rgov.log")
 
+CACHE_DIR = os.getenv("XDG_CACHE_HOME", os.path.join(Path.home(), ".cache"))
+CACHE_DB = os.path.join(CACHE_DIR, "rgov", "cache.db")
+
+STATE_DIR = os.getenv(
+    "XDG_STATE_HOME", os.path.join(Path.home(), ".local", "state")
+)
+STATE_DB = os.path.join(STATE_DIR, "rgov", "daemon.db")
+STATS_FILE = os.path.join(STATE_DIR, "rgov", "stats.json")
+CONTROL_SOCKET = os.path.join(STATE_DIR, "rgov", "control.sock")
+
 EXAMPLE_DATA = os.path.join(DATA_FOLDER, "example.json")
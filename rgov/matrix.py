@@ -0,0 +1,110 @@
+import calendar
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class AvailabilityMatrix:
+    """Boolean sites x days matrix built once from a campground's
+    fetched months, so that stay queries become vectorized reductions.
+
+    Each row is one site in one month, in month order and then in the
+    order of the month document, and each column is one day. Keeping a
+    row per month (rather than per site label) reproduces the ordering
+    of Campground.get_available exactly. Requires numpy."""
+
+    def __init__(self, months: list):
+        if np is None:
+            raise ImportError("The matrix engine requires numpy.")
+
+        self.columns = {}
+        labels = []
+        blocks = []
+        offset = 0
+        row_offsets = []
+        for month in months:
+            if month.first is None:
+                continue
+            n_days = calendar.monthrange(month.year, month.month)[1]
+            for day in range(n_days):
+                self.columns[month.first + day] = offset + day
+            masks = np.array([site.mask for site in month.sites], dtype=np.uint32)
+            days = np.arange(n_days, dtype=np.uint32)
+            blocks.append(((masks[:, None] >> days) & 1).astype(bool))
+            labels.extend(site.site for site in month.sites)
+            row_offsets.append((offset, n_days))
+            offset += n_days
+
+        self.matrix = np.zeros((len(labels), offset), dtype=bool)
+        row = 0
+        for block, (col, n_days) in zip(blocks, row_offsets):
+            self.matrix[row : row + len(block), col : col + n_days] = block
+            row += len(block)
+
+        self.labels = labels
+        # Rows belonging to the same site label share an index.
+        index = {}
+        self.label_index = np.array(
+            [index.setdefault(label, len(index)) for label in labels], dtype=np.intp
+        )
+        self.unique_labels = list(index)
+
+    def _stay_columns(self, stay_ordinals: list):
+        """Returns the column of each stay date, given as a day ordinal,
+        skipping dates outside the fetched months, along with the dates
+        kept."""
+        cols = []
+        kept = []
+        for ordinal in stay_ordinals:
+            if ordinal in self.columns:
+                cols.append(self.columns[ordinal])
+                kept.append(ordinal)
+        return np.array(cols, dtype=np.intp), kept
+
+    def per_date_counts(self, stay_ordinals: list) -> dict:
+        """Returns the number of available sites on each stay date."""
+        cols, kept = self._stay_columns(stay_ordinals)
+        counts = self.matrix[:, cols].sum(axis=0)
+        return dict(zip(kept, counts.tolist()))
+
+    def site_totals(self, stay_ordinals: list):
+        """Returns the number of stay dates each site label is
+        available, indexed like unique_labels."""
+        cols, _ = self._stay_columns(stay_ordinals)
+        row_totals = self.matrix[:, cols].sum(axis=1)
+        return np.bincount(
+            self.label_index, weights=row_totals, minlength=len(self.unique_labels)
+        )
+
+    def available(self, stay_ordinals: list) -> list:
+        """Returns the site labels available on every stay date, i.e.
+        with a contiguous stay, ordered as Campground.available."""
+        cols, _ = self._stay_columns(stay_ordinals)
+        sub = self.matrix[:, cols]
+        totals = np.bincount(
+            self.label_index,
+            weights=sub.sum(axis=1),
+            minlength=len(self.unique_labels),
+        )
+        # Labels in the order of their first row with any hit.
+        hit_rows = np.flatnonzero(sub.any(axis=1))
+        labels, first = np.unique(self.label_index[hit_rows], return_index=True)
+        ordered = labels[np.argsort(first)]
+        return [
+            self.unique_labels[i] for i in ordered if totals[i] == len(stay_ordinals)
+        ]
+
+    def per_date_availability(self, stay_ordinals: list) -> dict:
+        """Returns {date: [site labels]} for every stay date with at
+        least one available site."""
+        cols, kept = self._stay_columns(stay_ordinals)
+        sub = self.matrix[:, cols]
+        d = defaultdict(list)
+        for j, date in enumerate(kept):
+            rows = np.flatnonzero(sub[:, j])
+            if len(rows):
+                d[date] = [self.labels[i] for i in rows]
+        return d
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Seconds between rewrites of the stats file.
+STATS_INTERVAL = 15
+
+# What each metric counts, for the Prometheus HELP lines.
+HELP = {
+    "requests": "Requests sent upstream",
+    "request_seconds": "Time to complete a request",
+    "month_seconds": "Time to fetch a month document of a campground",
+    "bytes": "Response bytes received",
+    "cache": "Month lookups by outcome",
+    "parse_seconds": "Time to parse a month document",
+    "poll_seconds": "Time to poll every month of a campground",
+    "errors": "Errors by type",
+    "notifications": "Notifications sent",
+}
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def quantile(buckets: list, count: int, q: float) -> float:
+    """Estimates the q quantile from cumulative [bound, count] buckets,
+    as Prometheus' histogram_quantile does. Returns the largest finite
+    bound if the quantile falls in the last bucket."""
+    if count == 0:
+        return 0.0
+    rank = q * count
+    lower, below = 0.0, 0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound is None:
+                return lower
+            in_bucket = cumulative - below
+            if in_bucket == 0:
+                return bound
+            return lower + (bound - lower) * (rank - below) / in_bucket
+        lower, below = bound, cumulative
+    return lower
+
+
+class Registry:
+    """Counters and histograms, each keyed by name and labels. Safe to
+    update from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value=1, **labels):
+        key = (name, _key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """Returns every metric as plain data, as written to the stats
+        file. Histogram buckets are cumulative [upper bound, count]
+        pairs, with None as the last bound."""
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append(
+                    {"labels": dict(labels), "value": value}
+                )
+            histograms = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                buckets = []
+                for bound, n in zip(BUCKETS + (None,), histogram.counts):
+                    cumulative += n
+                    buckets.append([bound, cumulative])
+                histograms.setdefault(name, []).append(
+                    {
+                        "labels": dict(labels),
+                        "buckets": buckets,
+                        "sum": histogram.sum,
+                        "count": histogram.count,
+                    }
+                )
+        return {
+            "started_at": self.started_at,
+            "written_at": time.time(),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """Formats a snapshot in the Prometheus text exposition format."""
+
+    def labels_text(labels, extra=None):
+        items = list(labels.items()) + (extra or [])
+        if not items:
+            return ""
+        pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+        return "{" + pairs + "}"
+
+    lines = []
+    for name, series in snapshot["counters"].items():
+        lines.append(f"# HELP rgov_{name}_total {HELP.get(name, name)}")
+        lines.append(f"# TYPE rgov_{name}_total counter")
+        for s in series:
+            lines.append(f"rgov_{name}_total{labels_text(s['labels'])} {s['value']}")
+    for name, series in snapshot["histograms"].items():
+        lines.append(f"# HELP rgov_{name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE rgov_{name} histogram")
+        for s in series:
+            for bound, cumulative in s["buckets"]:
+                le = "+Inf" if bound is None else repr(float(bound))
+                lines.append(
+                    f"rgov_{name}_bucket{labels_text(s['labels'], [('le', le)])} "
+                    f"{cumulative}"
+                )
+            lines.append(f"rgov_{name}_sum{labels_text(s['labels'])} {s['sum']}")
+            lines.append(f"rgov_{name}_count{labels_text(s['labels'])} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_stats(path: str, registry=None):
+    """Writes a snapshot of the registry to path as JSON. The file is
+    replaced in one step, so readers never see a partial one."""
+    registry = registry or get_default()
+    # Only the owner may read or replace the stats.
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def read_stats(path: str) -> dict:
+    """Reads a stats file written by write_stats."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def serve(port: int, host="127.0.0.1", registry=None) -> ThreadingHTTPServer:
+    """Serves the registry in the Prometheus format at /metrics from a
+    background thread. Returns the server; call shutdown() to stop
+    it."""
+    registry = registry or get_default()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(registry.snapshot()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Created up front, as it is updated from many threads.
+_default = Registry()
+
+
+def get_default() -> Registry:
+    return _default
+
+
+def inc(name: str, value=1, **labels):
+    get_default().inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    get_default().observe(name, value, **labels)
@@ -0,0 +1,110 @@
+import json
+
+# Suffix shared by every date key in a month document.
+DATE_KEY_SUFFIX = "T00:00:00Z"
+
+
+class SiteFilter:
+    """Decides which campsites are worth keeping. campsite_type matches
+    any part of the site's type (e.g. "tent" matches "TENT ONLY
+    NONELECTRIC"), loop matches the loop name, party_size is the
+    smallest max_num_people accepted, and sites lists the site labels
+    to keep ("7" matches "007"). Unset criteria match every site."""
+
+    def __init__(self, campsite_type=None, loop=None, party_size=None, sites=None):
+        self.campsite_type = campsite_type.lower() if campsite_type else None
+        self.loop = loop.lower() if loop else None
+        self.party_size = party_size
+        self.sites = (
+            {site.strip().lstrip("0") for site in sites} if sites else None
+        )
+
+    @classmethod
+    def from_spec(cls, spec: dict):
+        """Builds the filter of a watch spec, or of a search_spec. Raises
+        ValueError if party_size isn't a number."""
+        sites = spec.get("sites")
+        if isinstance(sites, str):
+            sites = sites.split(",")
+        return cls(
+            campsite_type=spec.get("site_type"),
+            loop=spec.get("loop"),
+            party_size=int(spec["party_size"]) if spec.get("party_size") else None,
+            sites=[str(site) for site in sites] if sites else None,
+        )
+
+    def _key(self):
+        sites = frozenset(self.sites) if self.sites is not None else None
+        return (self.campsite_type, self.loop, self.party_size, sites)
+
+    def __eq__(self, other):
+        return isinstance(other, SiteFilter) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __bool__(self):
+        return any(
+            criterion is not None
+            for criterion in (self.campsite_type, self.loop, self.party_size, self.sites)
+        )
+
+    def __call__(self, site: dict) -> bool:
+        if self.campsite_type is not None:
+            if self.campsite_type not in (site.get("campsite_type") or "").lower():
+                return False
+        if self.loop is not None:
+            if (site.get("loop") or "").lower() != self.loop:
+                return False
+        if self.party_size is not None:
+            if (site.get("max_num_people") or 0) < self.party_size:
+                return False
+        if self.sites is not None:
+            if str(site.get("site")).strip().lstrip("0") not in self.sites:
+                return False
+        return True
+
+
+def _hook(stay_dates, site_filter):
+    """Returns an object_pairs_hook that trims each object as soon as
+    it is decoded, so that only the parts needed to answer a query over
+    stay_dates, at the sites site_filter accepts, are ever held at
+    once."""
+
+    def hook(pairs):
+        obj = dict(pairs)
+        if pairs and pairs[0][0].endswith(DATE_KEY_SUFFIX):
+            # A per-date map, e.g. a site's availabilities.
+            if stay_dates is None:
+                return obj
+            return {date: obj[date] for date in stay_dates if date in obj}
+        if "availabilities" in obj:
+            # A site record; None marks it for removal below.
+            if site_filter and not site_filter(obj):
+                return None
+            if stay_dates is None:
+                return obj
+            return {"site": obj.get("site"), "availabilities": obj["availabilities"]}
+        if isinstance(obj.get("campsites"), dict):
+            # The document itself.
+            campsites = obj["campsites"]
+            obj["campsites"] = {
+                id_num: site for id_num, site in campsites.items() if site is not None
+            }
+        return obj
+
+    return hook
+
+
+def parse_campsites(body: bytes, stay_dates=None, site_filter=None) -> dict:
+    """Decodes a month document and returns its campsites. If
+    stay_dates is given, each site keeps only its "site" label and its
+    availabilities on those dates. If site_filter is given, sites it
+    rejects are dropped. Both happen while the document is decoded.
+    Raises KeyError if the document has no campsites, which happens
+    when the campground id is invalid."""
+    if stay_dates is None and not site_filter:
+        return json.loads(body)["campsites"]
+    return json.loads(body, object_pairs_hook=_hook(stay_dates, site_filter))[
+        "campsites"
+    ]
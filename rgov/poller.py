@@ -0,0 +1,519 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+
+from rgov import engine, metrics, pushsafer, transport, utils
+from rgov.campground import ENDPOINT, Campground, request_document
+from rgov.control import ControlServer
+from rgov.diff import SnapshotDiff
+
+
+def campground_plan(watches: list) -> dict:
+    """Returns {campground: (request_dates, stay_dates, arrival)} with
+    everything each campground must answer for the watches, where
+    arrival is the day ordinal of the earliest stay."""
+    plan = {}
+    for watch in watches:
+        arrival = watch.dates.stay_ordinals[0]
+        for campground in watch.campgrounds:
+            request_dates, stay_dates, first = plan.get(campground, ([], [], arrival))
+            plan[campground] = (
+                list(dict.fromkeys(request_dates + watch.dates.request_dates)),
+                list(dict.fromkeys(stay_dates + watch.dates.stay_dates)),
+                min(first, arrival),
+            )
+    return plan
+
+
+def fetch_plan(plan: dict) -> dict:
+    """Returns {campground id: (request_dates, arrival, campgrounds)}
+    from a campground_plan, merging the Campgrounds of every site filter
+    of an id, so that each month document is fetched once however many
+    filters read it."""
+    fetches = {}
+    for campground, (request_dates, _, arrival) in plan.items():
+        dates, first, campgrounds = fetches.get(campground.id_num, ([], arrival, []))
+        fetches[campground.id_num] = (
+            list(dict.fromkeys(dates + request_dates)),
+            min(first, arrival),
+            campgrounds + [campground],
+        )
+    return fetches
+
+
+def _build_months(plans: dict, documents: dict) -> dict:
+    """Returns {campground: [Month per request date]} for plans, which
+    is {campground: (request_dates, stay_dates)}, parsing documents,
+    {request date: CacheEntry}, with the site filter of each
+    campground."""
+    return {
+        campground: [
+            campground.load_document(date, documents[date], stay_dates)
+            for date in request_dates
+        ]
+        for campground, (request_dates, stay_dates) in plans.items()
+    }
+
+
+class Poller:
+    """Polls the campgrounds of every watch on an asyncio event loop.
+
+    Each campground id runs as its own task, which sleeps on a timer
+    until the scheduler says it is due. It then fetches its month
+    documents as concurrent requests on a thread pool, builds the months
+    of each site filter watched from them, and evaluates and notifies
+    the watches using it. A slow or failing campground never holds up the
+    others, and a poll takes as long as its slowest month. If a Burst
+    is given, it polls every campground on its own timer. If a
+    DaemonState is given, the poller checkpoints to it after every poll.
+    If stats_path is given, the metrics are written to it every
+    metrics.STATS_INTERVAL seconds. If control_path is given, the poller
+    takes commands on a Unix socket there; see rgov.control.
+
+    The poller stops once every watch has reached its notification
+    limit, unless keep_running is True."""
+
+    def __init__(
+        self,
+        scheduler,
+        ps_api_key,
+        burst=None,
+        max_workers=engine.MAX_WORKERS,
+        state=None,
+        stats_path=None,
+        control_path=None,
+        keep_running=False,
+    ):
+        self.scheduler = scheduler
+        self.burst = burst
+        self.state = state
+        self.stats_path = stats_path
+        self.control_path = control_path
+        self.keep_running = keep_running
+        self.ps_api_key = ps_api_key
+        self.max_workers = max_workers
+        self.watches = []
+        # Only sites that weren't available on the previous check are
+        # notified.
+        self.snapshots = SnapshotDiff()
+        # One Campground per id and site filter, shared by every watch
+        # with that filter.
+        self.campgrounds = {}
+        # {campground: (request_dates, stay_dates, arrival)}
+        self.plan = {}
+        # The same by id, which is what is fetched and scheduled:
+        # {id: (request_dates, arrival, campgrounds)}
+        self.fetches = {}
+        # The last document fetched for each month, which every site
+        # filter of the id parses: {id: {request date: CacheEntry}}
+        self.documents = {}
+        # Campgrounds whose last fetch succeeded.
+        self.ready = set()
+        self._loop = None
+        self._executor = None
+        self._done = None
+        self._tasks = {}
+        self._wake = {}
+        self._locks = {}
+
+    def add_watch(self, watch):
+        watch.campgrounds = [
+            self.campgrounds.setdefault(
+                (id, watch.site_filter),
+                # Its months are only ever built by poll().
+                Campground(
+                    id,
+                    selective=True,
+                    max_age=float("inf"),
+                    site_filter=watch.site_filter,
+                ),
+            )
+            for id in watch.ids
+        ]
+        self.watches.append(watch)
+        self._update_plan()
+
+    def remove_watch(self, watch):
+        self.watches.remove(watch)
+        for key, _ in self.snapshots.snapshots():
+            if key[0] == watch.name:
+                self.snapshots.forget(key)
+        self._update_plan()
+
+    def find_watch(self, name):
+        """Returns the watch named name, or None."""
+        for watch in self.watches:
+            if watch.name == name:
+                return watch
+        return None
+
+    def pause_watch(self, watch):
+        """Stops polling for and notifying the watch until it is
+        resumed. Its last snapshots are kept, so that only what changed
+        meanwhile is notified on resuming."""
+        watch.paused = True
+        self._update_plan()
+
+    def resume_watch(self, watch):
+        watch.paused = False
+        self._update_plan()
+
+    def checkpoint(self):
+        if self.state is None:
+            return
+        try:
+            self.state.checkpoint(self)
+        except sqlite3.Error as error:
+            metrics.inc("errors", type=type(error).__name__)
+            logging.error(f"checkpoint: {error}")
+
+    def write_stats(self):
+        if self.stats_path is None:
+            return
+        try:
+            metrics.write_stats(self.stats_path)
+        except OSError as error:
+            logging.error(f"stats: {error}")
+
+    def _update_plan(self):
+        last_plan = self.plan
+        self.plan = campground_plan([w for w in self.watches if not w.paused])
+        self.fetches = fetch_plan(self.plan)
+        for id_num, (request_dates, arrival, _) in self.fetches.items():
+            self.scheduler.add(id_num, arrival, len(request_dates))
+        for campground, (request_dates, stay_dates, _) in self.plan.items():
+            last = last_plan.get(campground)
+            if last is None or last[:2] != (request_dates, stay_dates):
+                # The months held can't answer the new watches yet.
+                self.ready.discard(campground)
+                self.poll_now(campground.id_num)
+        for id_num in self.scheduler:
+            if id_num not in self.fetches:
+                self.scheduler.remove(id_num)
+                self.documents.pop(id_num, None)
+        self.ready.intersection_update(self.plan)
+
+        if self._loop is not None:
+            self._start_tasks()
+            if not self.watches and not self.keep_running:
+                self._done.set()
+
+    def stop(self):
+        """Makes run() return."""
+        if self._done is not None:
+            self._done.set()
+
+    def poll_now(self, id_num):
+        """Makes the campground id due and wakes its task."""
+        self.scheduler.hurry(id_num)
+        if id_num in self._wake:
+            self._wake[id_num].set()
+
+    def _start_tasks(self):
+        """Starts a task for every campground id in the plan without
+        one, and wakes those no longer in it so that they finish."""
+        for id_num in self.fetches:
+            if id_num not in self._tasks:
+                self._wake[id_num] = asyncio.Event()
+                self._locks.setdefault(id_num, asyncio.Lock())
+                self._tasks[id_num] = self._loop.create_task(
+                    self._run_campground(id_num)
+                )
+        for id_num in self._tasks:
+            if id_num not in self.fetches:
+                self._wake[id_num].set()
+
+    async def run(self):
+        """Polls until every watch has reached its notification limit,
+        or until stop() if keep_running is set."""
+        self._loop = asyncio.get_running_loop()
+        self._done = asyncio.Event()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as self._executor:
+            control = None
+            if self.control_path is not None:
+                control = ControlServer(self, self.control_path)
+                await control.start()
+            self._start_tasks()
+            tasks = []
+            if self.burst is not None:
+                logging.info(f"next release at {self.burst.release}")
+                tasks.append(self._loop.create_task(self._run_burst()))
+            if self.stats_path is not None:
+                tasks.append(self._loop.create_task(self._run_stats()))
+            if not self.watches and not self.keep_running:
+                self._done.set()
+
+            await self._done.wait()
+
+            if control is not None:
+                await control.close()
+            tasks.extend(self._tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop = None
+        self.checkpoint()
+        self.write_stats()
+
+    async def _run_campground(self, id_num):
+        wake = self._wake[id_num]
+        try:
+            while id_num in self.scheduler:
+                wait = self.scheduler.wait(id_num)
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(wake.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    wake.clear()
+                    continue
+
+                try:
+                    polled = await self.poll(id_num)
+                    if polled:
+                        await self.evaluate(polled)
+                except Exception as error:
+                    # Back off rather than retry straight away.
+                    metrics.inc("errors", type=type(error).__name__)
+                    logging.error(f"{id_num}: {error}")
+                    self.scheduler.record(id_num, error=True)
+        finally:
+            del self._tasks[id_num]
+
+    async def _run_burst(self):
+        burst = self.burst
+        while True:
+            await asyncio.sleep(burst.wait())
+            try:
+                if burst.warm_due():
+                    opened = await self._loop.run_in_executor(
+                        self._executor, transport.warm, ENDPOINT, self.max_workers
+                    )
+                    logging.info(f"opened {opened} connection(s) for the release")
+                if burst.tick():
+                    # Every campground, bypassing the schedule.
+                    polled = await asyncio.gather(
+                        *(self.poll(i, bursting=True) for i in list(self.fetches))
+                    )
+                    await self.evaluate([c for cs in polled for c in cs])
+            except Exception as error:
+                metrics.inc("errors", type=type(error).__name__)
+                logging.error(f"burst: {error}")
+
+    async def _run_stats(self):
+        while True:
+            await asyncio.sleep(metrics.STATS_INTERVAL)
+            await self._loop.run_in_executor(self._executor, self.write_stats)
+
+    async def poll(self, id_num, bursting=False) -> list:
+        """Fetches every month document of the campground id again, all
+        at once, rebuilds the months of each of its site filters from
+        them and reschedules it. The months held are replaced only once
+        all have arrived, so the campground can be evaluated meanwhile.
+        Polls during a burst bypass the month cache and leave the
+        schedule alone. Returns the Campgrounds updated, or an empty list
+        on failure."""
+        async with self._locks[id_num]:
+            if id_num not in self.fetches:
+                return []
+            request_dates, _, campgrounds = self.fetches[id_num]
+            plans = {c: self.plan[c][:2] for c in campgrounds}
+            before = {c: c.months_fingerprint for c in campgrounds if c in self.ready}
+
+            start = time.perf_counter()
+            try:
+                documents = await asyncio.gather(
+                    *(
+                        self._loop.run_in_executor(
+                            self._executor,
+                            self._fetch_document,
+                            id_num,
+                            date,
+                            bursting,
+                        )
+                        for date in request_dates
+                    )
+                )
+                documents = dict(zip(request_dates, documents))
+                months = await self._loop.run_in_executor(
+                    self._executor, _build_months, plans, documents
+                )
+            except (URLError, KeyError, ValueError) as error:
+                metrics.inc("errors", type=type(error).__name__)
+                logging.error(f"{id_num}: {error}")
+                self.ready.difference_update(campgrounds)
+                if not bursting:
+                    self.scheduler.record(id_num, error=True)
+                return []
+
+            metrics.observe(
+                "poll_seconds", time.perf_counter() - start, campground=id_num
+            )
+            self.documents[id_num] = documents
+            updated = []
+            for campground, (request_dates, stay_dates) in plans.items():
+                campground.expire()
+                for date, month in zip(request_dates, months[campground]):
+                    campground.store_month(date, month, stay_dates)
+                # Unless the watches changed what it must answer while
+                # the documents were on their way.
+                if self.plan.get(campground, ())[:2] == (request_dates, stay_dates):
+                    self.ready.add(campground)
+                    updated.append(campground)
+            if not bursting:
+                changed = any(
+                    fingerprint != campground.months_fingerprint
+                    for campground, fingerprint in before.items()
+                )
+                self.scheduler.record(id_num, changed=changed)
+            return updated
+
+    def _fetch_document(self, id_num, date, revalidate):
+        """Returns the month document, which is the one held if
+        upstream says it hasn't changed."""
+        held = self.documents.get(id_num, {}).get(date)
+        entry = request_document(
+            id_num,
+            date,
+            validators=held.validators if held is not None else (None, None),
+            revalidate=revalidate,
+        )
+        return held if entry is None else entry
+
+    async def evaluate(self, polled: list):
+        """Evaluates every watch using a campground in polled and sends
+        its notifications."""
+        for watch in list(self.watches):
+            if watch.paused or not any(c in polled for c in watch.campgrounds):
+                continue
+
+            message = self.check_watch(watch)
+            if message is not None:
+                await self._loop.run_in_executor(
+                    self._executor, self.notify, watch, message
+                )
+
+            if watch in self.watches and watch.notifications >= watch.notify_limit:
+                logging.info(
+                    f"{watch.name}: notification limit reached "
+                    f"[{watch.notifications}/{watch.notify_limit}]"
+                )
+                self.remove_watch(watch)
+
+        wire_bytes, decoded_bytes = transport.transfer_stats()
+        logging.info(
+            f"received {wire_bytes} bytes in total "
+            f"({decoded_bytes} bytes decoded)"
+        )
+        self.checkpoint()
+
+    def check_watch(self, watch):
+        """Evaluates a watch against the months already fetched for its
+        campgrounds. Returns the notification to send for any new
+        availability, or None."""
+        dates = watch.dates
+        available = {}
+        per_date_availability = {}
+        found_available_sites = False
+        for campground in watch.campgrounds:
+            if campground not in self.ready:
+                continue
+
+            if watch.flexible:
+                campground.get_windows(
+                    dates.request_dates, dates.stay_dates, dates.length_of_stay
+                )
+                found = campground.windows
+            else:
+                campground.get_available(dates.request_dates, dates.stay_dates)
+                per_date_availability[campground.name] = (
+                    campground.per_date_availability
+                )
+                found = campground.available
+
+            if len(found) > 0:
+                found_available_sites = True
+
+            key = (watch.name, campground.id_num)
+            seen = key in self.snapshots
+            change = self.snapshots.update(key, campground.fingerprint, found)
+            if change is None and seen:
+                logging.info(f"{watch.name}: {campground.name} - unchanged")
+            elif change is None:
+                # Nothing found on the first check.
+                logging.info(f"{watch.name}: {campground.name} - no available site(s)")
+            else:
+                if change.lost:
+                    logging.info(
+                        f"{watch.name}: {campground.name} - {len(change.lost)} "
+                        "no longer available"
+                    )
+                if change.new:
+                    logging.info(
+                        f"{watch.name}: {campground.name} - found available site(s)"
+                    )
+                    available[campground.name] = change.new
+                elif not found:
+                    logging.info(
+                        f"{watch.name}: {campground.name} - no available site(s)"
+                    )
+
+        if available:
+            if watch.flexible:
+                return pushsafer.gen_windows_notifier_text(available)
+            else:
+                return pushsafer.gen_notifier_text(available)
+
+        elif watch.any_combo and not watch.flexible and not found_available_sites:
+            logging.info(
+                f"{watch.name}: Checking for cross-site/cross-campground availability"
+            )
+
+            dates_dict = utils.check_for_combo_availability(
+                dates, per_date_availability
+            )
+
+            itinerary = None
+            if dates_dict is not None:
+                itinerary = utils.plan_itinerary(
+                    dates.stay_ordinals, dates_dict, watch.campground_first
+                )
+
+            change = self.snapshots.update(
+                (watch.name, "any-combo"),
+                hash(tuple(itinerary or ())),
+                itinerary or [],
+            )
+            if change is not None and change.new:
+                logging.info(
+                    f"{watch.name}: Found availability accross sites. Sending pushsafer notification"
+                )
+
+                return pushsafer.gen_itinerary_notifier_text(itinerary)
+
+        return None
+
+    def notify(self, watch, message):
+        pushsafer_status = pushsafer.notify(
+            self.ps_api_key, "a", message, watch.priority
+        )
+
+        if pushsafer_status["status"] == 0:
+            metrics.inc("notifications", watch=watch.name, result="failed")
+            logging.error(f"Pushsafer: {pushsafer_status}")
+        else:
+            metrics.inc("notifications", watch=watch.name, result="sent")
+            logging.info(f"Pushsafer: {pushsafer_status}")
+
+        watch.notifications += 1
+        if self.state is not None:
+            try:
+                self.state.record_notification(
+                    watch.name, message, pushsafer_status["status"]
+                )
+            except sqlite3.Error as error:
+                metrics.inc("errors", type=type(error).__name__)
+                logging.error(f"checkpoint: {error}")
@@ -1,12 +1,8 @@
 import getpass
 import json
 import os
-from datetime import datetime
-
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
-
-from rgov import locations
+from rgov import locations, transport
+from rgov.dates import format_ordinal
 
 
 def input_credentials() -> tuple[str, str]:
@@ -44,8 +40,7 @@ def validate_key(user: str, key: str) -> bool:
     """Return whether the Pushsafer credentials are valid or not."""
     url = "https://www.pushsafer.com/api-k"
     fields = {"u": user, "k": key}
-    req = Request(url, urlencode(fields).encode())
-    status = json.loads(urlopen(req).read().decode())
+    status = json.loads(transport.post(url, fields).body.decode())
     if status["status"] == 1:
         return True
     else:
@@ -64,18 +59,20 @@ def gen_notifier_text(cg_availability: dict) -> str:
             msg += f"{name}: {n_sites} sites available!\n"
     return msg
 
-def gen_any_combo_notifier_text(dates_breakdown, stay_dates):
+def gen_windows_notifier_text(cg_windows: dict) -> str:
     msg = ""
-    for date in stay_dates:
-        msg += datetime.strptime(date, '%Y-%m-%dT00:00:00Z').strftime('%B %d, %Y')
-
-        for campground in dates_breakdown[date]:
-            output = ", ".join(sorted([str(int(n)) for n in dates_breakdown[date][campground]]))
-            msg += f"\n{campground}"
-            msg += f"\n{output}"
-
-        msg += "\n\n"
+    for name, windows in cg_windows.items():
+        arrivals = ", ".join(
+            format_ordinal(date, "%b %d") for date in windows
+        )
+        msg += f"{name}: arrive {arrivals}\n"
+    return msg
 
+def gen_itinerary_notifier_text(itinerary) -> str:
+    msg = ""
+    for campground, site, date, nights in itinerary:
+        arrival = format_ordinal(date, "%b %d")
+        msg += f"{arrival}, {nights} night(s): {campground} site {site}\n"
     return msg
 
 def notify(key: str, device: str, msg: str, priority: str, url=None) -> dict:
@@ -96,6 +93,5 @@ def notify(key: str, device: str, msg: str, priority: str, url=None) -> dict:
         post_fields["u"] = url
         post_fields["ut"] = "Campsite Page"
 
-    req = Request(endpoint, urlencode(post_fields).encode())
-    status = json.loads(urlopen(req).read().decode())
+    status = json.loads(transport.post(endpoint, post_fields).body.decode())
     return status
@@ -0,0 +1,276 @@
+import datetime
+import time
+
+# Seconds between polls of a campground with nothing to go on.
+INTERVAL = 300
+
+# Bounds on the seconds between polls of any one campground.
+MIN_INTERVAL = 30
+MAX_INTERVAL = 60 * 60
+
+# Month documents requested per hour across every campground.
+BUDGET = 600
+
+# How far a campground's own history may move its interval: changes
+# halve it, down to MIN_ACTIVITY, and quiet polls grow it by
+# ACTIVITY_GROWTH, up to MAX_ACTIVITY.
+MIN_ACTIVITY = 0.25
+MAX_ACTIVITY = 4
+ACTIVITY_GROWTH = 1.25
+
+# Consecutive errors beyond this don't slow a campground down further.
+MAX_BACKOFF = 5
+
+
+class _Entry:
+    __slots__ = ("arrival", "requests", "activity", "errors", "next_poll")
+
+    def __init__(self, arrival, requests):
+        self.arrival = arrival
+        self.requests = requests
+        self.activity = 1.0
+        self.errors = 0
+        self.next_poll = 0.0
+
+
+def _proximity(arrival: int, today: int) -> float:
+    """Scales the interval by how far away the arrival date is: half
+    for stays within two weeks, growing with the distance up to four
+    times for stays four months out or more."""
+    days = arrival - today
+    return min(max(days / 30, 0.5), 4)
+
+
+class Scheduler:
+    """Decides when each campground is polled next. A campground's
+    interval starts at interval and is then
+
+    - shortened when its availability changes and lengthened while it
+      doesn't,
+    - shortened for near-term arrival dates and lengthened for
+      far-future ones,
+    - doubled for every consecutive error,
+
+    within min_interval and max_interval. If polling every campground
+    at its interval would request more than budget month documents an
+    hour, every interval is stretched by the same factor to fit.
+
+    Times are taken from time.monotonic()."""
+
+    def __init__(
+        self,
+        interval=INTERVAL,
+        budget=BUDGET,
+        min_interval=MIN_INTERVAL,
+        max_interval=MAX_INTERVAL,
+    ):
+        self.base_interval = interval
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, interval)
+        self._entries = {}
+
+    def add(self, key, arrival: int, requests=1):
+        """Schedules key, e.g. a campground, for an immediate poll, or
+        updates it if it is already scheduled. arrival is the day
+        ordinal of the earliest stay it is watched for and requests is
+        the number of month documents each poll fetches."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = _Entry(arrival, requests)
+        else:
+            entry.arrival = arrival
+            entry.requests = requests
+
+    def remove(self, key):
+        self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def _interval(self, entry, today: int) -> float:
+        interval = self.base_interval * entry.activity
+        interval *= _proximity(entry.arrival, today)
+        interval *= 2 ** min(entry.errors, MAX_BACKOFF)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def intervals(self) -> dict:
+        """{key: seconds between polls}, stretched to fit the budget."""
+        today = datetime.date.today().toordinal()
+        intervals = {
+            key: self._interval(entry, today) for key, entry in self._entries.items()
+        }
+        rate = sum(
+            self._entries[key].requests * 3600 / interval
+            for key, interval in intervals.items()
+        )
+        if rate > self.budget:
+            stretch = rate / self.budget
+            intervals = {key: interval * stretch for key, interval in intervals.items()}
+        return intervals
+
+    def due(self, now=None) -> list:
+        """Returns the keys whose next poll is due."""
+        if now is None:
+            now = time.monotonic()
+        return [key for key, entry in self._entries.items() if entry.next_poll <= now]
+
+    def record(self, key, changed=False, error=False, now=None):
+        """Records the outcome of polling key and schedules its next
+        poll."""
+        if now is None:
+            now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+
+        if error:
+            entry.errors += 1
+        else:
+            entry.errors = 0
+            if changed:
+                entry.activity = max(entry.activity / 2, MIN_ACTIVITY)
+            else:
+                entry.activity = min(entry.activity * ACTIVITY_GROWTH, MAX_ACTIVITY)
+
+        entry.next_poll = now + self.intervals()[key]
+
+    def export(self, now=None) -> dict:
+        """Returns {key: (activity, errors, seconds until the next
+        poll)}, to be handed back to restore() by a later process."""
+        if now is None:
+            now = time.monotonic()
+        return {
+            key: (entry.activity, entry.errors, max(entry.next_poll - now, 0))
+            for key, entry in self._entries.items()
+        }
+
+    def restore(self, key, activity, errors, wait, now=None):
+        """Restores the history of key, which must have been added, as
+        exported by export()."""
+        if now is None:
+            now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.activity = min(max(activity, MIN_ACTIVITY), MAX_ACTIVITY)
+        entry.errors = errors
+        entry.next_poll = now + wait
+
+    def hurry(self, key):
+        """Makes key due now."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.next_poll = 0.0
+
+    def wait(self, key=None, now=None) -> float:
+        """Returns the seconds until the next poll of key, or of any key
+        if key is None, is due. Returns base_interval if nothing is
+        scheduled."""
+        if key is not None:
+            entries = [self._entries[key]] if key in self._entries else []
+        else:
+            entries = list(self._entries.values())
+        if not entries:
+            return self.base_interval
+        if now is None:
+            now = time.monotonic()
+        next_poll = min(entry.next_poll for entry in entries)
+        return max(next_poll - now, 0)
+
+
+# Burst mode: connections are opened WARM_LEAD seconds before the
+# release, and every campground is polled every BURST_INTERVAL seconds
+# from BURST_LEAD seconds before it until BURST_WINDOW seconds after.
+WARM_LEAD = 10
+BURST_LEAD = 2
+BURST_INTERVAL = 2
+BURST_WINDOW = 120
+
+
+class Burst:
+    """Times the polls around a daily release, e.g. inventory opening
+    at 10:00 every morning on a rolling window. The release is given as
+    a local wall-clock time and converted once per day to a
+    time.monotonic() instant, which all the timing is based on."""
+
+    def __init__(
+        self,
+        release: datetime.time,
+        window=BURST_WINDOW,
+        interval=BURST_INTERVAL,
+        warm_lead=WARM_LEAD,
+        lead=BURST_LEAD,
+    ):
+        self.release_time = release
+        self.window = window
+        self.interval = interval
+        self.warm_lead = warm_lead
+        self.lead = lead
+        self._schedule()
+
+    def _schedule(self, after=None):
+        """Schedules the first release whose burst hasn't ended yet,
+        skipping the one at after, if given."""
+        wall = datetime.datetime.now()
+        now = time.monotonic()
+        release = datetime.datetime.combine(wall.date(), self.release_time)
+        while (release - wall).total_seconds() + self.window <= 0 or (
+            after is not None and release <= after
+        ):
+            release += datetime.timedelta(days=1)
+
+        self.release = release
+        instant = now + (release - wall).total_seconds()
+        self.warm_at = instant - self.warm_lead
+        self.start = instant - self.lead
+        self.end = instant + self.window
+        self.next_tick = self.start
+        self.warmed = False
+
+    def warm_due(self, now=None) -> bool:
+        """Returns True, once per release, when it is time to open
+        connections ahead of it."""
+        if now is None:
+            now = time.monotonic()
+        if self.warmed or now < self.warm_at:
+            return False
+        self.warmed = True
+        return True
+
+    def tick(self, now=None) -> bool:
+        """Returns True if a burst poll is due. Ticks missed while a
+        poll ran late are skipped rather than run back to back. Once
+        the window closes, the next release is scheduled."""
+        if now is None:
+            now = time.monotonic()
+        if now >= self.end:
+            self._schedule(after=self.release)
+            return False
+        if now < self.next_tick:
+            return False
+        while self.next_tick <= now:
+            self.next_tick += self.interval
+        return True
+
+    def wait(self, now=None) -> float:
+        """Returns the seconds until the next warm up or burst poll."""
+        if now is None:
+            now = time.monotonic()
+        if not self.warmed:
+            return max(self.warm_at - now, 0)
+        return max(min(self.next_tick, self.end) - now, 0)
+
+
+def parse_release(release: str) -> datetime.time:
+    """Parses a release time given as HH:MM or HH:MM:SS. Raises
+    ValueError if it is neither."""
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.datetime.strptime(release, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f'"{release}" is not a time of the form HH:MM')
@@ -0,0 +1,180 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from rgov import locations
+
+
+def _item(item):
+    """Turns a snapshot item read back from JSON into what SnapshotDiff
+    stores: a site label or a tuple."""
+    return tuple(item) if isinstance(item, list) else item
+
+
+class DaemonState:
+    """Checkpoints a daemon's watches, notification counts and history,
+    paused watches, last seen availability and per-campground schedule
+    to a SQLite database, so that a restarted daemon carries on where
+    the last one stopped instead of fetching and notifying everything
+    again.
+
+    Each checkpoint is written in a single transaction, so a crash
+    leaves the previous checkpoint intact. Each thread uses its own
+    connection."""
+
+    def __init__(self, path=locations.STATE_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # Watch specs read back from here are trusted, so only the
+            # owner may write to it.
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(
+                """CREATE TABLE IF NOT EXISTS watches (
+                    name TEXT PRIMARY KEY,
+                    spec TEXT NOT NULL,
+                    notifications INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    watch TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    items TEXT NOT NULL,
+                    PRIMARY KEY (watch, key)
+                );
+                CREATE TABLE IF NOT EXISTS schedule (
+                    campground TEXT PRIMARY KEY,
+                    activity REAL NOT NULL,
+                    errors INTEGER NOT NULL,
+                    next_poll REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS paused (
+                    watch TEXT PRIMARY KEY
+                );
+                CREATE TABLE IF NOT EXISTS notifications (
+                    watch TEXT NOT NULL,
+                    sent_at REAL NOT NULL,
+                    message TEXT NOT NULL,
+                    status INTEGER
+                );"""
+            )
+            self._local.con = con
+        return con
+
+    def close(self):
+        """Closes this thread's connection, e.g. before the process
+        daemonizes."""
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    def watch_specs(self) -> list:
+        """Returns the spec of every watch checkpointed."""
+        con = self._connect()
+        with contextlib.closing(con.cursor()) as cur:
+            cur.execute("SELECT spec FROM watches ORDER BY rowid")
+            return [json.loads(row[0]) for row in cur.fetchall()]
+
+    def restore(self, poller):
+        """Restores what was checkpointed about the poller's watches and
+        campgrounds. A watch is only restored if it was checkpointed
+        with the same spec."""
+        con = self._connect()
+        with contextlib.closing(con.cursor()) as cur:
+            cur.execute("SELECT name, spec, notifications FROM watches")
+            saved = {
+                name: (json.loads(spec), notifications)
+                for name, spec, notifications in cur.fetchall()
+            }
+            cur.execute("SELECT watch FROM paused")
+            paused = {row[0] for row in cur.fetchall()}
+            cur.execute("SELECT watch, key, items FROM snapshots")
+            snapshots = cur.fetchall()
+            cur.execute(
+                "SELECT campground, activity, errors, next_poll FROM schedule"
+            )
+            schedule = cur.fetchall()
+
+        restored = set()
+        for watch in poller.watches:
+            if watch.name in saved and saved[watch.name][0] == watch.spec:
+                watch.notifications = saved[watch.name][1]
+                restored.add(watch.name)
+                if watch.name in paused:
+                    poller.pause_watch(watch)
+
+        for name, key, items in snapshots:
+            if name in restored:
+                poller.snapshots.restore(
+                    (name, json.loads(key)), [_item(i) for i in json.loads(items)]
+                )
+
+        # next_poll was saved as a wall-clock time.
+        now = time.time()
+        for id_num, activity, errors, next_poll in schedule:
+            if id_num in poller.fetches:
+                poller.scheduler.restore(
+                    id_num, activity, errors, max(next_poll - now, 0)
+                )
+
+        return restored
+
+    def checkpoint(self, poller):
+        """Replaces the checkpoint with the poller's current state."""
+        now = time.time()
+        watches = [
+            (watch.name, json.dumps(watch.spec), watch.notifications)
+            for watch in poller.watches
+        ]
+        names = {watch.name for watch in poller.watches}
+        paused = [(watch.name,) for watch in poller.watches if watch.paused]
+        snapshots = [
+            (key[0], json.dumps(key[1]), json.dumps(sorted(items, key=str)))
+            for key, items in poller.snapshots.snapshots()
+            if key[0] in names
+        ]
+        schedule = [
+            (id_num, activity, errors, now + wait)
+            for id_num, (activity, errors, wait) in poller.scheduler.export().items()
+        ]
+
+        con = self._connect()
+        with con:
+            con.execute("DELETE FROM watches")
+            con.executemany("INSERT INTO watches VALUES (?, ?, ?)", watches)
+            con.execute("DELETE FROM paused")
+            con.executemany("INSERT INTO paused VALUES (?)", paused)
+            con.execute("DELETE FROM snapshots")
+            con.executemany("INSERT INTO snapshots VALUES (?, ?, ?)", snapshots)
+            con.execute("DELETE FROM schedule")
+            con.executemany("INSERT INTO schedule VALUES (?, ?, ?, ?)", schedule)
+
+    def record_notification(self, watch: str, message: str, status=None):
+        con = self._connect()
+        with con:
+            con.execute(
+                "INSERT INTO notifications VALUES (?, ?, ?, ?)",
+                (watch, time.time(), message, status),
+            )
+
+    def notifications(self, watch=None) -> list:
+        """Returns (watch, sent_at, message, status) for every
+        notification sent, or only those of watch, oldest first."""
+        con = self._connect()
+        with contextlib.closing(con.cursor()) as cur:
+            if watch is None:
+                cur.execute("SELECT * FROM notifications ORDER BY sent_at")
+            else:
+                cur.execute(
+                    "SELECT * FROM notifications WHERE watch = ? ORDER BY sent_at",
+                    (watch,),
+                )
+            return cur.fetchall()
@@ -0,0 +1,322 @@
+import base64
+import http.client
+import io
+import threading
+import time
+import zlib
+from collections import defaultdict
+from urllib.error import HTTPError, URLError
+from urllib.parse import unquote, urlencode, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+from rgov import metrics
+
+# Seconds to wait on a socket before giving up on a request.
+TIMEOUT = 30
+
+# Idle connections kept open per host for reuse.
+MAX_IDLE = 8
+
+# Bytes read from the socket at a time.
+CHUNK_SIZE = 64 * 1024
+
+ACCEPT_ENCODING = "gzip, deflate"
+
+# Redirects followed before giving up, as urllib does.
+MAX_REDIRECTS = 10
+
+REDIRECTS = (301, 302, 303, 307, 308)
+
+# Methods that may be sent again if the server drops a reused
+# connection, as repeating them has no further effect.
+IDEMPOTENT = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+# How a server hanging up on a reused connection shows when reading
+# the response.
+DROPPED = (http.client.RemoteDisconnected, ConnectionResetError)
+
+
+class Response:
+    def __init__(self, url, status, reason, headers, body, wire_bytes=None):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        # Size of the body as sent, before any decompression.
+        self.wire_bytes = len(body) if wire_bytes is None else wire_bytes
+
+
+class _Decoder:
+    """Decompresses a gzip or deflate body one chunk at a time.
+    Deflate bodies may come with or without a zlib header."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._started = False
+        if encoding == "gzip":
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self._obj = zlib.decompressobj()
+
+    def decompress(self, chunk: bytes) -> bytes:
+        if self.encoding == "deflate" and not self._started:
+            self._started = True
+            try:
+                return self._obj.decompress(chunk)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(chunk)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+def _read_body(resp) -> tuple:
+    """Reads a response body, decompressing it as it streams in.
+    Returns the decoded body and the number of bytes on the wire."""
+    encoding = resp.getheader("Content-Encoding", "identity").strip().lower()
+    decoder = _Decoder(encoding) if encoding in ("gzip", "deflate") else None
+    wire_bytes = 0
+    chunks = []
+    while True:
+        chunk = resp.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        wire_bytes += len(chunk)
+        chunks.append(decoder.decompress(chunk) if decoder else chunk)
+    if decoder:
+        chunks.append(decoder.flush())
+    return b"".join(chunks), wire_bytes
+
+
+class ConnectionPool:
+    """Keeps HTTP(S) connections open between requests so that
+    repeated requests to the same host skip the TCP and TLS handshakes.
+    Safe to share between threads: a connection is only ever used by
+    the thread that took it from the pool."""
+
+    def __init__(self, max_idle=MAX_IDLE, timeout=TIMEOUT, proxies=None):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        # {scheme: proxy URL}, read from http_proxy, https_proxy and
+        # the like unless given, as urllib does.
+        self.proxies = getproxies() if proxies is None else proxies
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+    def _proxy(self, scheme: str, host: str):
+        """Returns the host of the proxy to reach host through and the
+        headers that authenticate with it, or None to connect
+        directly."""
+        proxy = self.proxies.get(scheme)
+        if not proxy or proxy_bypass(host):
+            return None
+        if "://" not in proxy:
+            proxy = f"http://{proxy}"
+        parts = urlsplit(proxy)
+        headers = {}
+        if parts.username is not None:
+            credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+            token = base64.b64encode(credentials.encode()).decode()
+            headers["Proxy-Authorization"] = f"Basic {token}"
+        return parts.netloc.rpartition("@")[2], headers
+
+    def _connect(self, scheme: str, host: str):
+        if scheme not in ("http", "https"):
+            raise URLError(f"unsupported scheme: {scheme}")
+        proxy = self._proxy(scheme, host)
+        if scheme == "https":
+            if proxy is None:
+                return http.client.HTTPSConnection(host, timeout=self.timeout)
+            # TLS runs end to end through a CONNECT tunnel.
+            conn = http.client.HTTPSConnection(proxy[0], timeout=self.timeout)
+            conn.set_tunnel(host, headers=proxy[1])
+            return conn
+        return http.client.HTTPConnection(
+            host if proxy is None else proxy[0], timeout=self.timeout
+        )
+
+    def _get(self, key: tuple, reuse=True):
+        """Returns an idle connection to the host and whether it was
+        reused, opening a new one if none are idle or reuse is
+        False."""
+        if reuse:
+            with self._lock:
+                if self._idle[key]:
+                    return self._idle[key].pop(), True
+        return self._connect(*key), False
+
+    def _put(self, key: tuple, conn):
+        with self._lock:
+            if len(self._idle[key]) < self.max_idle:
+                self._idle[key].append(conn)
+                return
+        conn.close()
+
+    def warm(self, url: str, count=1) -> int:
+        """Opens connections to the host of url until count are idle,
+        so that the next requests skip the DNS lookup and the TCP and
+        TLS handshakes. Returns the number opened; connections that
+        fail to open are skipped."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self._lock:
+            missing = count - len(self._idle[key])
+        opened = 0
+        for _ in range(missing):
+            conn = self._connect(*key)
+            try:
+                conn.connect()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                continue
+            self._put(key, conn)
+            opened += 1
+        return opened
+
+    def request(self, method: str, url: str, body=None, headers=None) -> Response:
+        """Sends a request over a pooled connection and returns the
+        response with its body read and decompressed. Redirects are
+        followed as urllib follows them. Raises HTTPError for 4xx and
+        5xx responses and for redirects that aren't followed, and
+        URLError if the host can't be reached."""
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", ACCEPT_ENCODING)
+
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._send(method, url, body, headers)
+            location = response.headers.get("Location")
+            if response.status not in REDIRECTS or location is None:
+                break
+            if method.upper() not in ("GET", "HEAD"):
+                # A form may be redirected to a page to GET, but not
+                # sent on elsewhere.
+                if response.status not in (301, 302, 303):
+                    break
+                method, body = "GET", None
+                headers = {
+                    name: value
+                    for name, value in headers.items()
+                    if name.lower() not in ("content-length", "content-type")
+                }
+            url = urljoin(url, location)
+        else:
+            raise HTTPError(
+                url,
+                response.status,
+                "Too many redirects",
+                response.headers,
+                io.BytesIO(response.body),
+            )
+
+        if response.status >= 300 and response.status != 304:
+            raise HTTPError(
+                url,
+                response.status,
+                response.reason,
+                response.headers,
+                io.BytesIO(response.body),
+            )
+        return response
+
+    def _send(self, method: str, url: str, body, headers: dict) -> Response:
+        """Sends a single request and returns the response, whatever
+        its status.
+
+        If the server has dropped a reused connection, an idempotent
+        request is sent again once on a fresh one, provided it either
+        never went out or the server hung up without answering. Other
+        requests are always sent on a fresh connection, as they can't
+        be retried without risking doing them twice."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        proxy = self._proxy(*key) if parts.scheme == "http" else None
+        if proxy is not None:
+            # A plain HTTP proxy takes the whole URL.
+            path = f"http://{parts.netloc}{path}"
+            headers = {**headers, **proxy[1]}
+
+        reuse = method.upper() in IDEMPOTENT
+        start = time.perf_counter()
+        while True:
+            conn, reused = self._get(key, reuse=reuse)
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                sent = True
+                resp = conn.getresponse()
+                data, wire_bytes = _read_body(resp)
+            except (http.client.HTTPException, OSError, zlib.error) as error:
+                conn.close()
+                # The server may have dropped an idle keep-alive
+                # connection, in which case the other idle ones are
+                # likely stale too. A timeout or an error partway
+                # through the response isn't retried, as it isn't one.
+                if reused and (not sent or isinstance(error, DROPPED)):
+                    reuse = False
+                    continue
+                metrics.inc("requests", host=parts.netloc, status="error")
+                raise URLError(error)
+            break
+        metrics.observe(
+            "request_seconds", time.perf_counter() - start, host=parts.netloc
+        )
+        metrics.inc("requests", host=parts.netloc, status=resp.status)
+        metrics.inc("bytes", wire_bytes, host=parts.netloc, kind="wire")
+        metrics.inc("bytes", len(data), host=parts.netloc, kind="decoded")
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._put(key, conn)
+
+        with self._lock:
+            self.wire_bytes += wire_bytes
+            self.decoded_bytes += len(data)
+
+        return Response(
+            url, resp.status, resp.reason, resp.headers, data, wire_bytes
+        )
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+_pool = ConnectionPool()
+
+
+def transfer_stats() -> tuple:
+    """Returns the total bytes received on the wire and after
+    decompression by this process."""
+    return _pool.wire_bytes, _pool.decoded_bytes
+
+
+def close():
+    """Closes every idle connection, e.g. before the process
+    daemonizes and its file descriptors are closed under them."""
+    _pool.close()
+
+
+def warm(url: str, count=1) -> int:
+    return _pool.warm(url, count)
+
+
+def get(url: str, headers=None) -> Response:
+    return _pool.request("GET", url, headers=headers)
+
+
+def post(url: str, fields: dict, headers=None) -> Response:
+    """Posts fields as an urlencoded form."""
+    headers = dict(headers or {})
+    headers["Content-Type"] = "application/x-www-form-urlencoded"
+    return _pool.request("POST", url, urlencode(fields).encode(), headers)
@@ -0,0 +1,92 @@
+import os
+import threading
+
+# Number of distinct user agents drawn from fake_useragent for the pool.
+POOL_SIZE = 20
+
+# Used when fake_useragent is unavailable or fails to load.
+FALLBACK_USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:119.0) "
+    "Gecko/20100101 Firefox/119.0",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:119.0) Gecko/20100101 Firefox/119.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.0 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) "
+    "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 "
+    "Mobile/15E148 Safari/604.1",
+]
+
+
+def load_fake_useragents(size=POOL_SIZE) -> list:
+    """Draws up to size distinct user agents from fake_useragent.
+    Returns an empty list if it isn't installed or can't load its
+    data."""
+    try:
+        from fake_useragent import UserAgent
+    except ImportError:
+        return []
+
+    try:
+        ua = UserAgent()
+        return list(dict.fromkeys(ua.random for _ in range(size)))
+    except Exception:
+        return []
+
+
+class UserAgentProvider:
+    """Rotates through a pool of user agents. The pool is loaded once,
+    on first use, from loader; the built-in list is used if the loader
+    comes back empty."""
+
+    def __init__(self, loader=load_fake_useragents):
+        self._loader = loader
+        self._pool = None
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._loader() or list(FALLBACK_USER_AGENTS)
+            user_agent = self._pool[self._index % len(self._pool)]
+            self._index += 1
+            return user_agent
+
+
+class FixedUserAgent:
+    """Always returns the same user agent, e.g. for benchmarks."""
+
+    def __init__(self, user_agent: str):
+        self.user_agent = user_agent
+
+    def get(self) -> str:
+        return self.user_agent
+
+
+_provider = None
+
+
+def set_provider(provider):
+    """Replaces the process-wide provider. Any object with a get()
+    method returning a user agent string will do."""
+    global _provider
+    _provider = provider
+
+
+def get() -> str:
+    """Returns the next user agent from the process-wide provider. If
+    RGOV_USER_AGENT is set, it is used for every request."""
+    global _provider
+    if _provider is None:
+        pinned = os.getenv("RGOV_USER_AGENT")
+        if pinned:
+            _provider = FixedUserAgent(pinned)
+        else:
+            _provider = UserAgentProvider()
+    return _provider.get()
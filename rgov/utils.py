@@ -10,7 +10,7 @@ def check_for_combo_availability(dates, per_date_availability):
         for date in per_date_availability[campground].keys():
             dates_dict[date][campground] = per_date_availability[campground][date]
     possible_combo = True
-    for date in dates.stay_dates:
+    for date in dates.stay_ordinals:
         if not dates_dict[date]:
             possible_combo = False
             break
@@ -19,3 +19,83 @@ def check_for_combo_availability(dates, per_date_availability):
     else:
         return None
 
+
+
+def plan_itinerary(stay_dates, dates_dict, campground_first=False):
+    """Finds the itinerary covering every night in stay_dates with the
+    fewest moves between sites, given dates_dict as returned by
+    check_for_combo_availability. If campground_first is True, the
+    fewest moves between campgrounds wins before the fewest moves
+    overall. Returns a list of (campground, site, first night, nights)
+    stays, or None if some night has no site at all.
+
+    This is a shortest path over (campground, site) states, one layer
+    per night. Moving from the best state of the previous night, or
+    from the best one at the same campground, are the only transitions
+    worth considering, so each night costs O(sites)."""
+    if campground_first:
+        site_move, campground_move = (0, 1), (1, 1)
+    else:
+        site_move, campground_move = (1,), (1,)
+
+    def add(a, b):
+        return tuple(x + y for x, y in zip(a, b))
+
+    layers = []
+    prev = {}
+    for night, date in enumerate(stay_dates):
+        states = [
+            (campground, site)
+            for campground, sites in dates_dict.get(date, {}).items()
+            for site in sites
+        ]
+        if not states:
+            return None
+
+        if night == 0:
+            zero = (0,) * len(site_move)
+            cost = {state: (zero, None) for state in states}
+        else:
+            best = min(prev, key=lambda state: prev[state][0])
+            best_at = {}
+            for state, (c, _) in prev.items():
+                campground = state[0]
+                if campground not in best_at or c < prev[best_at[campground]][0]:
+                    best_at[campground] = state
+
+            best_cost = add(prev[best][0], campground_move)
+            local_cost = {
+                campground: (add(prev[state][0], site_move), state)
+                for campground, state in best_at.items()
+            }
+
+            cost = {}
+            for state in states:
+                choice = (best_cost, best)
+                local = local_cost.get(state[0])
+                if local is not None and local[0] < choice[0]:
+                    choice = local
+                same = prev.get(state)
+                if same is not None and same[0] <= choice[0]:
+                    choice = (same[0], state)
+                cost[state] = choice
+
+        layers.append(cost)
+        prev = cost
+
+    # Walk the parents back from the cheapest final state.
+    state = min(prev, key=lambda state: prev[state][0])
+    path = []
+    for cost in reversed(layers):
+        path.append(state)
+        state = cost[state][1]
+    path.reverse()
+
+    itinerary = []
+    for date, (campground, site) in zip(stay_dates, path):
+        if itinerary and itinerary[-1][:2] == (campground, site):
+            last = itinerary[-1]
+            itinerary[-1] = (campground, site, last[2], last[3] + 1)
+        else:
+            itinerary.append((campground, site, date, 1))
+    return itinerary
@@ -0,0 +1,120 @@
+import json
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+from rgov.dates import DateRange, Dates
+from rgov.parse import SiteFilter
+
+# Notifications a watch sends before it is dropped, unless it sets its
+# own notify_limit.
+NOTIFY_LIMIT = 3
+
+
+class Watch:
+    """A stay to look for at one or more campgrounds, along with how to
+    evaluate and notify it. dates is a Dates, or a DateRange to look for
+    any stay of its length within the range."""
+
+    def __init__(
+        self,
+        name,
+        ids,
+        dates,
+        any_combo=False,
+        campground_first=False,
+        priority=0,
+        notify_limit=NOTIFY_LIMIT,
+        site_filter=None,
+    ):
+        self.name = name
+        self.ids = list(ids)
+        self.dates = dates
+        self.any_combo = any_combo
+        self.campground_first = campground_first
+        self.priority = priority
+        self.notify_limit = notify_limit
+        self.site_filter = site_filter or SiteFilter()
+        self.notifications = 0
+        # A paused watch is neither polled for nor notified.
+        self.paused = False
+        # The watch file entry it was built from, if any.
+        self.spec = None
+        # The Campground of each id, set by the daemon.
+        self.campgrounds = []
+
+    @property
+    def flexible(self) -> bool:
+        return isinstance(self.dates, DateRange)
+
+    @classmethod
+    def from_spec(cls, spec: dict, name=None):
+        """Builds a Watch from one entry of a watch file. Raises
+        ValueError if the entry is incomplete or invalid."""
+        try:
+            ids = spec["ids"]
+            date = spec["date"]
+            length = str(spec["length"])
+        except KeyError as error:
+            raise ValueError(f"watch {name or ''} is missing {error}")
+
+        if isinstance(ids, str):
+            ids = [ids]
+
+        if spec.get("flexible"):
+            dates = DateRange(date, spec["flexible"], length)
+        else:
+            dates = Dates(date, length)
+
+        priority = int(spec.get("priority", 0))
+        if priority > 2 or priority < -2:
+            raise ValueError("Priority should be between -2 and 2.")
+
+        watch = cls(
+            spec.get("name", name),
+            [str(id) for id in ids],
+            dates,
+            any_combo=bool(spec.get("any_combo", False)),
+            campground_first=bool(spec.get("campground_first", False)),
+            priority=priority,
+            notify_limit=int(spec.get("notify_limit", NOTIFY_LIMIT)),
+            site_filter=SiteFilter.from_spec(spec),
+        )
+        watch.spec = dict(spec, name=watch.name)
+        return watch
+
+
+def load_watches(path: str) -> list:
+    """Reads a JSON or, on Python 3.11+, TOML watch file. Watches are
+    listed under "watches" (or [[watches]] tables in TOML), or the JSON
+    document may be the list itself. Raises ValueError if the file
+    can't be parsed or a watch is invalid."""
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("TOML watch files require Python 3.11 or later.")
+        with open(path, "rb") as f:
+            try:
+                document = tomllib.load(f)
+            except tomllib.TOMLDecodeError as error:
+                raise ValueError(f"{path}: {error}")
+    else:
+        with open(path, "r") as f:
+            try:
+                document = json.load(f)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"{path}: {error}")
+
+    if isinstance(document, dict):
+        document = document.get("watches", [])
+
+    watches = []
+    for i, spec in enumerate(document):
+        watches.append(Watch.from_spec(spec, name=f"watch {i + 1}"))
+
+    names = [watch.name for watch in watches]
+    if len(set(names)) != len(names):
+        raise ValueError("Watch names must be unique.")
+
+    return watches
@@ -1,17 +1,47 @@
 import json
 
-from rgov import locations
+from rgov import locations, transport
 from rgov.campground import Campground
 from rgov.dates import Dates
 
-SAMPLE_DATES = Dates("01-29-2022", "10")
-SAMPLE_CAMPGROUND = Campground("232279")
+
+def sample_dates() -> Dates:
+    """The stay the example data was fetched for. Built on demand, as
+    the date has since passed and Dates rejects it."""
+    return Dates("01-29-2022", "10")
+
+
+def sample_campground() -> Campground:
+    return Campground("232279")
+
+
+def sample_body(index=0) -> bytes:
+    """Month index of the example data as upstream sends it."""
+    with open(locations.EXAMPLE_DATA, "r") as f:
+        campsites = json.load(f)[index]
+    return json.dumps({"campsites": campsites, "count": len(campsites)}).encode()
+
+
+def stub_get(monkeypatch, respond=None) -> list:
+    """Answers every transport.get with the sample month, or with what
+    respond(url) returns or raises. Returns the list every URL requested
+    is appended to."""
+    requests = []
+    body = sample_body()
+
+    def get(url, headers=None):
+        requests.append(url)
+        if respond is not None:
+            return respond(url)
+        return transport.Response(url, 200, "OK", {}, body)
+
+    monkeypatch.setattr(transport, "get", get)
+    return requests
 
 
 def main():
-    requests = SAMPLE_CAMPGROUND._request(
-        SAMPLE_DATES.request_dates, SAMPLE_DATES.stay_dates
-    )
+    dates = sample_dates()
+    requests = sample_campground()._request(dates.request_dates, dates.stay_dates)
 
     with open(locations.EXAMPLE_DATA, "w") as f:
         f.write(json.dumps(requests, indent=4))
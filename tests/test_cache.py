@@ -0,0 +1,35 @@
+import os
+import time
+
+from rgov.cache import MonthCache
+
+MONTH = "2022-01-01T00:00:00.000Z"
+
+
+def test_get_put(tmp_path):
+    cache = MonthCache(os.path.join(tmp_path, "cache.db"), ttl=60)
+    assert cache.get("232279", MONTH) is None
+    cache.put("232279", MONTH, b'{"campsites": {}}', etag='"abc"')
+    entry = cache.get("232279", MONTH)
+    assert entry.body == b'{"campsites": {}}'
+    assert entry.validators == ('"abc"', None)
+    assert cache.is_fresh(entry)
+    assert cache.get("232280", MONTH) is None
+
+
+def test_expired_entries_are_kept_for_revalidation(tmp_path):
+    cache = MonthCache(os.path.join(tmp_path, "cache.db"), ttl=1)
+    cache.put("232279", MONTH, b"{}", last_modified="Sat, 01 Jan 2022 00:00:00 GMT")
+    time.sleep(1.1)
+    entry = cache.get("232279", MONTH)
+    assert not cache.is_fresh(entry)
+    cache.touch("232279", MONTH)
+    assert cache.is_fresh(cache.get("232279", MONTH))
+
+
+def test_zero_ttl_disables_cache(tmp_path):
+    path = os.path.join(tmp_path, "cache.db")
+    cache = MonthCache(path, ttl=0)
+    cache.put("232279", MONTH, b"{}")
+    assert cache.get("232279", MONTH) is None
+    assert not os.path.exists(path)
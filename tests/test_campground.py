@@ -1,22 +1,28 @@
 import json
+import os
+import threading
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlsplit
 
-from rgov import locations
+import pytest
+
+from rgov import locations, transport
+from rgov.cache import MonthCache
 from rgov.campground import Campground
+from rgov.dates import Dates, to_ordinal
 from tests import gen_sample
 
 
-DATES = gen_sample.SAMPLE_DATES
-CAMPGROUND = gen_sample.SAMPLE_CAMPGROUND
-
-
 def test_name():
     cg = Campground("232279")
     assert cg.name == "Laguna"
 
 
 def test_availability():
-    CAMPGROUND.get_available(DATES.request_dates, DATES.stay_dates, test=True)
-    assert CAMPGROUND.available == [
+    dates = gen_sample.sample_dates()
+    campground = gen_sample.sample_campground()
+    campground.get_available(dates.request_dates, dates.stay_dates, test=True)
+    assert campground.available == [
         "001",
         "002",
         "023",
@@ -57,11 +63,127 @@ def test_availability():
         "033",
     ]
     assert (
-        CAMPGROUND.gen_cli_text()
+        campground.gen_cli_text()
         == "<info>Laguna</>: <fg=magenta>38</> sites available"
     )
 
     assert (
-        CAMPGROUND.url
+        campground.url
         == "https://www.recreation.gov/camping/campgrounds/232279/availability"
     )
+
+
+def test_windows():
+    stay_dates = [
+        "2022-01-29T00:00:00Z",
+        "2022-01-30T00:00:00Z",
+        "2022-01-31T00:00:00Z",
+        "2022-02-01T00:00:00Z",
+    ]
+    cg = Campground("232279")
+    cg.get_windows([], stay_dates, 3, test=True)
+    assert list(cg.windows) == [to_ordinal(date) for date in stay_dates[:2]]
+
+    for i, date in enumerate(stay_dates[:2]):
+        single = Campground("232279")
+        single.get_available([], stay_dates[i : i + 3], test=True)
+        assert sorted(cg.windows[to_ordinal(date)]) == sorted(single.available)
+
+
+class Stay:
+    def __init__(self, stay_dates):
+        self.request_dates = []
+        self.stay_dates = stay_dates
+
+
+def test_available_batch():
+    stays = [
+        Stay(["2022-01-29T00:00:00Z", "2022-01-30T00:00:00Z"]),
+        Stay(["2022-01-31T00:00:00Z", "2022-02-01T00:00:00Z"]),
+        Stay(["2022-02-10T00:00:00Z"]),
+    ]
+    results = Campground("232279").get_available_batch(stays, test=True)
+    assert len(results) == len(stays)
+
+    for stay, (available, per_date) in zip(stays, results):
+        single = Campground("232279")
+        single.get_available([], stay.stay_dates, test=True)
+        assert available == single.available
+        assert per_date == single.per_date_availability
+
+
+def start_month(url):
+    return parse_qs(urlsplit(url).query)["start_date"][0][:7]
+
+
+def test_request_month_order(monkeypatch):
+    bodies = {
+        "2030-06": gen_sample.sample_body(0),
+        "2030-07": gen_sample.sample_body(1),
+    }
+    july_done = threading.Event()
+
+    def respond(url):
+        # June arrives last.
+        if start_month(url) == "2030-06":
+            assert july_done.wait(5)
+        else:
+            july_done.set()
+        return transport.Response(url, 200, "OK", {}, bodies[start_month(url)])
+
+    gen_sample.stub_get(monkeypatch, respond)
+    stay = Dates("06-29-2030", "3")
+    cg = Campground("232489", month_cache=MonthCache(ttl=0))
+    cg._request(stay.request_dates, stay.stay_dates)
+
+    # The example data covers January and February 2022.
+    assert [month.month for month in cg._request_data] == [1, 2]
+
+
+def test_request_month_error(monkeypatch):
+    july_failed = threading.Event()
+
+    def respond(url):
+        if start_month(url) == "2030-06":
+            assert july_failed.wait(5)
+            raise HTTPError(url, 500, "Internal Server Error", {}, None)
+        july_failed.set()
+        raise HTTPError(url, 503, "Service Unavailable", {}, None)
+
+    gen_sample.stub_get(monkeypatch, respond)
+    stay = Dates("06-29-2030", "3")
+    cg = Campground("232489", month_cache=MonthCache(ttl=0))
+    with pytest.raises(HTTPError) as info:
+        cg._request(stay.request_dates, stay.stay_dates)
+    # The first month's error, though it failed last.
+    assert info.value.code == 500
+
+
+def test_refetch_stale_months(tmp_path, monkeypatch):
+    requests = gen_sample.stub_get(monkeypatch)
+
+    def query(date, length):
+        stay = Dates(date, length)
+        requests.clear()
+        cg.get_available(stay.request_dates, stay.stay_dates)
+        return sorted(start_month(url) for url in requests)
+
+    month_cache = MonthCache(os.path.join(tmp_path, "cache.db"), ttl=0)
+    cg = Campground("232489", month_cache=month_cache, selective=True)
+
+    assert query("06-29-2030", "3") == ["2030-06", "2030-07"]
+    fetched = cg.fetched_months
+    # Held and trimmed to the same stay dates.
+    assert query("06-29-2030", "3") == []
+    assert query("06-29-2030", "2") == []
+    assert cg.fetched_months == fetched
+    # Missing.
+    assert query("08-10-2030", "2") == ["2030-08"]
+    # Trimmed to other stay dates.
+    assert query("06-27-2030", "2") == ["2030-06"]
+    assert cg.fetched_months["2030-07-01T00:00:00.000Z"] == fetched[
+        "2030-07-01T00:00:00.000Z"
+    ]
+    # Expired.
+    cg.max_age = 0
+    assert query("06-27-2030", "2") == ["2030-06"]
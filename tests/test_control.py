@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+import pytest
+
+from rgov import control
+from rgov.poller import Poller
+from rgov.scheduler import Scheduler
+
+SPEC = {"name": "a", "date": "06-29-2030", "length": "2", "ids": ["232489"]}
+
+
+def test_control(tmp_path, monkeypatch):
+    polled = []
+
+    async def poll(self, id_num, bursting=False):
+        polled.append(id_num)
+        self.scheduler.record(id_num)
+        return []
+
+    monkeypatch.setattr(Poller, "poll", poll)
+    path = str(tmp_path / "control.sock")
+    poller = Poller(Scheduler(), None, control_path=path, keep_running=True)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        run = loop.create_task(poller.run())
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+
+        def send(**request):
+            return loop.run_in_executor(None, control.send, path, request)
+
+        assert (await send(command="list"))["watches"] == []
+
+        reply = await send(command="add", spec=SPEC)
+        assert reply["watch"]["name"] == "a"
+        with pytest.raises(control.ControlError, match="already exists"):
+            await send(command="add", spec=SPEC)
+        await asyncio.sleep(0.05)
+        assert polled == ["232489"]
+
+        reply = await send(command="pause", name="a")
+        assert reply["watch"]["paused"]
+        assert poller.plan == {}
+        with pytest.raises(control.ControlError, match="paused"):
+            await send(command="poll", name="a")
+
+        await send(command="resume", name="a")
+        assert (await send(command="poll"))["campgrounds"] == 1
+        await asyncio.sleep(0.05)
+        assert len(polled) >= 2
+
+        with pytest.raises(control.ControlError, match="No watch"):
+            await send(command="remove", name="b")
+        with pytest.raises(control.ControlError, match="Unknown command"):
+            await send(command="restart")
+        await send(command="remove", name="a")
+        assert (await send(command="list"))["watches"] == []
+
+        await send(command="stop")
+        await asyncio.wait_for(run, 5)
+
+    asyncio.run(main())
+    assert not os.path.exists(path)
+
+
+def test_no_daemon(tmp_path):
+    with pytest.raises(control.ControlError, match="Could not reach"):
+        control.send(str(tmp_path / "control.sock"), {"command": "list"})
+
+
+def test_socket_private(tmp_path):
+    path = str(tmp_path / "rgov" / "control.sock")
+    server = control.ControlServer(None, path)
+
+    async def main():
+        await server.start()
+        mode = os.stat(path).st_mode & 0o777
+        await server.close()
+        return mode
+
+    assert asyncio.run(main()) == 0o600
+    assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
@@ -1,5 +1,5 @@
 import pytest
-from rgov.dates import Dates
+from rgov.dates import DateRange, Dates, RecurringDates, format_ordinal, to_ordinal
 
 
 def test_validate_arrival_date():
@@ -65,3 +65,52 @@ def test_validate_arrival_date():
         "2022-04-01T00:00:00Z",
         "2022-04-02T00:00:00Z",
     ]
+
+
+def test_date_range():
+    dates = DateRange("12-30-2030", "1-2-2031", "2")
+    assert dates.request_dates == [
+        "2030-12-01T00:00:00.000Z",
+        "2031-01-01T00:00:00.000Z",
+    ]
+    assert dates.stay_dates == [
+        "2030-12-30T00:00:00Z",
+        "2030-12-31T00:00:00Z",
+        "2031-01-01T00:00:00Z",
+        "2031-01-02T00:00:00Z",
+    ]
+    assert dates.arrival_dates == [
+        "2030-12-30T00:00:00Z",
+        "2030-12-31T00:00:00Z",
+        "2031-01-01T00:00:00Z",
+    ]
+    with pytest.raises(ValueError):
+        DateRange("12-30-2030", "12-30-2030", "2")
+
+
+def test_recurring_dates():
+    dates = RecurringDates("5-1-2031", "5-31-2031", "2", "fri")
+    assert dates.arrival_dates == [
+        "2031-05-02T00:00:00Z",
+        "2031-05-09T00:00:00Z",
+        "2031-05-16T00:00:00Z",
+        "2031-05-23T00:00:00Z",
+        "2031-05-30T00:00:00Z",
+    ]
+    assert dates.windows[0] == ["2031-05-02T00:00:00Z", "2031-05-03T00:00:00Z"]
+    assert dates.request_dates == ["2031-05-01T00:00:00.000Z"]
+    with pytest.raises(ValueError):
+        RecurringDates("5-1-2031", "5-31-2031", "2", "someday")
+    with pytest.raises(ValueError):
+        RecurringDates("5-1-2031", "5-2-2031", "2", "fri")
+
+
+def test_ordinals():
+    ordinal = to_ordinal("2030-02-28T00:00:00Z")
+    assert to_ordinal("2030-03-01T00:00:00Z") == ordinal + 1
+    assert format_ordinal(ordinal) == "February 28, 2030"
+    assert format_ordinal(ordinal, "%m-%d") == "02-28"
+
+    dates = RecurringDates("02-01-2030", "02-28-2030", "2", "fri")
+    assert dates.arrival_ordinals == [to_ordinal(d) for d in dates.arrival_dates]
+    assert dates.stay_ordinals == [to_ordinal(d) for d in dates.stay_dates]
@@ -0,0 +1,29 @@
+from rgov.diff import SnapshotDiff
+
+
+def test_snapshot_diff():
+    snapshots = SnapshotDiff()
+    assert "232279" not in snapshots
+    change = snapshots.update("232279", 1, ["001", "002"])
+    assert "232279" in snapshots
+    assert change.new == ["001", "002"]
+    assert change.lost == []
+
+    assert snapshots.update("232279", 1, ["001", "002"]) is None
+    # A new fingerprint with the same sites is not a change either.
+    assert snapshots.update("232279", 2, ["002", "001"]) is None
+
+    change = snapshots.update("232279", 3, ["002", "003"])
+    assert change.new == ["003"]
+    assert change.lost == ["001"]
+
+    snapshots.forget("232279")
+    assert snapshots.update("232279", 3, ["002", "003"]).new == ["002", "003"]
+
+
+def test_snapshot_diff_windows():
+    snapshots = SnapshotDiff()
+    snapshots.update("232279", 1, {738184: ["001"], 738185: ["001", "002"]})
+    change = snapshots.update("232279", 2, {738185: ["002", "003"]})
+    assert change.new == {738185: ["003"]}
+    assert change.lost == {738184: ["001"], 738185: ["001"]}
@@ -0,0 +1,92 @@
+import os
+import threading
+from urllib.error import HTTPError
+
+from rgov import engine, transport
+from rgov.cache import MonthCache
+from rgov.campground import Campground
+from rgov.dates import Dates
+from tests.gen_sample import sample_body, stub_get
+
+# Two months: June and July.
+DATES = Dates("06-29-2030", "3")
+
+
+def campgrounds(tmp_path, *ids):
+    month_cache = MonthCache(os.path.join(tmp_path, "cache.db"), ttl=0)
+    return [Campground(id_num, month_cache=month_cache) for id_num in ids]
+
+
+def plan(*campgrounds):
+    return {
+        campground: (DATES.request_dates, DATES.stay_dates)
+        for campground in campgrounds
+    }
+
+
+def campground_id(url):
+    return url.split("/campground/")[1].split("/")[0]
+
+
+def test_check_available(tmp_path, monkeypatch):
+    body = sample_body()
+
+    def respond(url):
+        id_num = campground_id(url)
+        if id_num == "500":
+            raise HTTPError(url, 500, "Internal Server Error", {}, None)
+        if id_num == "404":
+            # What upstream sends for a campground that doesn't exist.
+            return transport.Response(url, 200, "OK", {}, b"{}")
+        return transport.Response(url, 200, "OK", {}, body)
+
+    stub_get(monkeypatch, respond)
+    checked = list(
+        engine.check_available(campgrounds(tmp_path, "232489", "500", "404"), DATES)
+    )
+
+    # Each campground once, however many of its months failed.
+    errors = {campground.id_num: error for campground, error in checked}
+    assert len(checked) == 3
+    assert errors["232489"] is None
+    assert isinstance(errors["500"], HTTPError)
+    assert isinstance(errors["404"], KeyError)
+
+    (ok,) = (campground for campground, error in checked if error is None)
+    assert sorted(ok.fetched_months) == DATES.request_dates
+    assert ok.available is not None
+
+
+def test_fetch_streams(tmp_path, monkeypatch):
+    release = threading.Event()
+    body = sample_body()
+
+    def respond(url):
+        if campground_id(url) == "slow":
+            assert release.wait(5)
+        return transport.Response(url, 200, "OK", {}, body)
+
+    stub_get(monkeypatch, respond)
+    slow, fast = campgrounds(tmp_path, "slow", "fast")
+
+    order = []
+    for campground, error in engine.fetch(plan(slow, fast)):
+        assert error is None
+        # Every month is held by the time the campground is yielded.
+        assert sorted(campground.fetched_months) == DATES.request_dates
+        order.append(campground)
+        release.set()
+    assert order == [fast, slow]
+
+
+def test_fetch_fresh(tmp_path, monkeypatch):
+    requests = stub_get(monkeypatch)
+    held, new = campgrounds(tmp_path, "232489", "234064")
+    held.get_available(DATES.request_dates, DATES.stay_dates)
+    requests.clear()
+
+    fetched = list(engine.fetch(plan(new, held)))
+
+    # Already held, so yielded before anything is fetched.
+    assert fetched == [(held, None), (new, None)]
+    assert sorted(campground_id(url) for url in requests) == ["234064", "234064"]
@@ -0,0 +1,23 @@
+import pytest
+
+from rgov.campground import Campground
+
+pytest.importorskip("numpy")
+
+STAY_DATES = [
+    "2022-01-29T00:00:00Z",
+    "2022-01-30T00:00:00Z",
+    "2022-01-31T00:00:00Z",
+    "2022-02-01T00:00:00Z",
+    "2022-02-02T00:00:00Z",
+]
+
+
+def test_matrix_matches_python_engine():
+    python_cg = Campground("232279")
+    python_cg.get_available([], STAY_DATES, test=True)
+    matrix_cg = Campground("232279", use_matrix=True)
+    matrix_cg.get_available([], STAY_DATES, test=True)
+
+    assert matrix_cg.available == python_cg.available
+    assert matrix_cg.per_date_availability == python_cg.per_date_availability
@@ -0,0 +1,87 @@
+import os
+import urllib.request
+
+from rgov import metrics
+
+
+def test_registry():
+    registry = metrics.Registry()
+    registry.inc("requests", host="a", status=200)
+    registry.inc("requests", host="a", status=200)
+    registry.inc("requests", host="a", status="error")
+    registry.observe("request_seconds", 0.003, host="a")
+    registry.observe("request_seconds", 0.2, host="a")
+    registry.observe("request_seconds", 60, host="a")
+
+    snapshot = registry.snapshot()
+    requests = {
+        s["labels"]["status"]: s["value"] for s in snapshot["counters"]["requests"]
+    }
+    assert requests == {"200": 2, "error": 1}
+
+    (latency,) = snapshot["histograms"]["request_seconds"]
+    assert latency["labels"] == {"host": "a"}
+    assert latency["count"] == 3
+    assert latency["sum"] == 60.203
+    # Cumulative, with everything in the last bucket.
+    assert latency["buckets"][0] == [0.005, 1]
+    assert latency["buckets"][-1] == [None, 3]
+    assert dict(map(tuple, latency["buckets"]))[0.25] == 2
+
+
+def test_quantile():
+    registry = metrics.Registry()
+    for _ in range(10):
+        registry.observe("parse_seconds", 0.04)
+    (parse,) = registry.snapshot()["histograms"]["parse_seconds"]
+
+    # Every observation falls between 0.025 and 0.05.
+    assert 0.025 <= metrics.quantile(parse["buckets"], 10, 0.5) <= 0.05
+    assert metrics.quantile(parse["buckets"], 10, 1) == 0.05
+    assert metrics.quantile(parse["buckets"], 0, 0.5) == 0.0
+
+
+def test_render_prometheus():
+    registry = metrics.Registry()
+    registry.inc("errors", type="URLError")
+    registry.observe("poll_seconds", 1.5, campground="232489")
+
+    text = metrics.render_prometheus(registry.snapshot())
+    assert "# TYPE rgov_errors_total counter" in text
+    assert 'rgov_errors_total{type="URLError"} 1' in text
+    assert "# TYPE rgov_poll_seconds histogram" in text
+    assert 'rgov_poll_seconds_bucket{campground="232489",le="1.0"} 0' in text
+    assert 'rgov_poll_seconds_bucket{campground="232489",le="2.5"} 1' in text
+    assert 'rgov_poll_seconds_bucket{campground="232489",le="+Inf"} 1' in text
+    assert 'rgov_poll_seconds_count{campground="232489"} 1' in text
+
+
+def test_stats_file(tmp_path):
+    registry = metrics.Registry()
+    registry.inc("cache", result="hit")
+    path = os.path.join(tmp_path, "rgov", "stats.json")
+
+    metrics.write_stats(path, registry)
+    registry.inc("cache", result="hit")
+    metrics.write_stats(path, registry)
+
+    stats = metrics.read_stats(path)
+    assert stats["counters"]["cache"] == [{"labels": {"result": "hit"}, "value": 2}]
+    assert os.listdir(os.path.dirname(path)) == ["stats.json"]
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+
+
+def test_serve():
+    registry = metrics.Registry()
+    registry.inc("notifications", watch="north rim", result="sent")
+    server = metrics.serve(0, registry=registry)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'rgov_notifications_total{result="sent",watch="north rim"} 1' in body
@@ -0,0 +1,56 @@
+from rgov.parse import SiteFilter, parse_campsites
+from tests.gen_sample import sample_body
+
+STAY_DATES = ["2022-01-30T00:00:00Z", "2022-01-31T00:00:00Z"]
+
+
+def test_parse_full():
+    campsites = parse_campsites(sample_body())
+    site = campsites["10082188"]
+    assert len(site["availabilities"]) == 31
+    assert "loop" in site
+
+
+def test_parse_selective():
+    full = parse_campsites(sample_body())
+    trimmed = parse_campsites(sample_body(), STAY_DATES)
+    assert trimmed.keys() == full.keys()
+    for id_num, site in trimmed.items():
+        assert set(site) == {"site", "availabilities"}
+        assert site["site"] == full[id_num]["site"]
+        assert site["availabilities"] == {
+            date: full[id_num]["availabilities"][date] for date in STAY_DATES
+        }
+
+
+def test_parse_filtered():
+    full = parse_campsites(sample_body())
+    site_filter = SiteFilter(campsite_type="tent", party_size=8)
+    filtered = parse_campsites(sample_body(), STAY_DATES, site_filter)
+    expected = {
+        id_num
+        for id_num, site in full.items()
+        if "TENT" in site["campsite_type"] and site["max_num_people"] >= 8
+    }
+    assert expected
+    assert set(filtered) == expected
+
+
+def test_site_filter():
+    site = {"site": "007", "loop": "SHADY", "campsite_type": "STANDARD NONELECTRIC"}
+    assert SiteFilter(sites=["7"])(site)
+    assert SiteFilter(loop="shady")(site)
+    assert not SiteFilter(loop="sunny")(site)
+    assert not SiteFilter(party_size=2)(site)
+    assert not SiteFilter()
+
+
+def test_site_filter_from_spec():
+    site_filter = SiteFilter.from_spec(
+        {"site_type": "tent", "party_size": "6", "sites": "7, 12"}
+    )
+    assert site_filter == SiteFilter(
+        campsite_type="tent", party_size=6, sites=["7", "12"]
+    )
+    assert SiteFilter.from_spec({"sites": [7, 12]}) == SiteFilter(sites=["7", "12"])
+    assert not SiteFilter.from_spec({"campground_first": True})
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+from rgov import cache
+from rgov.dates import Dates, to_ordinal
+from rgov.parse import SiteFilter
+from rgov.poller import Poller
+from rgov.scheduler import Scheduler
+from rgov.watches import Watch
+from tests.gen_sample import stub_get
+
+
+def test_shared_campgrounds():
+    poller = Poller(Scheduler(), None)
+    poller.add_watch(Watch("a", ["232489", "234064"], Dates("06-29-2030", "3")))
+    poller.add_watch(Watch("b", ["232489"], Dates("07-05-2030", "1")))
+    a, b = poller.watches
+    assert a.campgrounds[0] is b.campgrounds[0]
+    assert len(poller.plan) == 2
+
+    request_dates, stay_dates, arrival = poller.plan[a.campgrounds[0]]
+    assert request_dates == ["2030-06-01T00:00:00.000Z", "2030-07-01T00:00:00.000Z"]
+    assert len(stay_dates) == 4
+    assert arrival == to_ordinal("2030-06-29T00:00:00Z")
+
+    poller.remove_watch(a)
+    assert list(poller.plan) == [b.campgrounds[0]]
+    assert "234064" not in poller.scheduler
+
+
+def test_fetch_once_per_id(tmp_path, monkeypatch):
+    requests = stub_get(monkeypatch)
+
+    async def evaluate(self, polled):
+        self.stop()
+
+    monkeypatch.setattr(Poller, "evaluate", evaluate)
+    cache.set_default(cache.MonthCache(str(tmp_path / "cache.db"), ttl=0))
+    try:
+        poller = Poller(Scheduler(), None)
+        poller.add_watch(Watch("a", ["232489"], Dates("06-29-2030", "3")))
+        poller.add_watch(
+            Watch(
+                "b",
+                ["232489"],
+                Dates("06-29-2030", "3"),
+                site_filter=SiteFilter(campsite_type="tent"),
+            )
+        )
+        asyncio.run(poller.run())
+    finally:
+        cache.set_default(None)
+
+    # One request per month, however many site filters read it.
+    assert len(requests) == 2
+    a, b = (watch.campgrounds[0] for watch in poller.watches)
+    assert a is not b and {a, b} <= poller.ready
+    month = "2030-06-01T00:00:00.000Z"
+    assert 0 < len(b._months[month][0].sites) < len(a._months[month][0].sites)
+
+
+def test_check_watch_log(tmp_path, monkeypatch, caplog):
+    # The example data is for 2022, so nothing is free in 2030.
+    stub_get(monkeypatch)
+    cache.set_default(cache.MonthCache(str(tmp_path / "cache.db"), ttl=0))
+    try:
+        poller = Poller(Scheduler(), None)
+        watch = Watch("a", ["232489"], Dates("06-29-2030", "3"))
+        poller.add_watch(watch)
+        (campground,) = watch.campgrounds
+        campground._name = "North Rim"
+        poller.ready.add(campground)
+
+        with caplog.at_level(logging.INFO):
+            assert poller.check_watch(watch) is None
+            assert poller.check_watch(watch) is None
+    finally:
+        cache.set_default(None)
+
+    assert caplog.messages == [
+        "a: North Rim - no available site(s)",
+        "a: North Rim - unchanged",
+    ]
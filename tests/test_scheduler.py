@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+
+from rgov.scheduler import MIN_ACTIVITY, Burst, Scheduler, parse_release
+
+
+TODAY = datetime.date.today().toordinal()
+
+
+def test_scheduler_adapts():
+    scheduler = Scheduler(interval=300, budget=10_000)
+    scheduler.add("near", TODAY + 3)
+    scheduler.add("far", TODAY + 200)
+    assert sorted(scheduler.due(now=0)) == ["far", "near"]
+
+    scheduler.record("near", changed=True, now=0)
+    scheduler.record("far", now=0)
+    intervals = scheduler.intervals()
+    assert intervals["near"] < 300 < intervals["far"]
+    assert scheduler.due(now=intervals["near"]) == ["near"]
+    assert scheduler.wait(now=0) == intervals["near"]
+
+    for _ in range(10):
+        scheduler.record("near", changed=True, now=0)
+    # The busiest, nearest campgrounds bottom out at an eighth.
+    assert scheduler.intervals()["near"] == 300 * MIN_ACTIVITY * 0.5
+
+    quiet = scheduler.intervals()["far"]
+    scheduler.record("far", error=True, now=0)
+    assert scheduler.intervals()["far"] >= quiet
+
+
+def test_scheduler_budget():
+    scheduler = Scheduler(interval=60, budget=60)
+    for key in range(10):
+        scheduler.add(key, TODAY + 30, requests=2)
+    # 10 campgrounds x 2 months x 60 polls an hour, stretched to 60.
+    intervals = scheduler.intervals()
+    assert all(interval == 60 * 20 for interval in intervals.values())
+
+
+def test_burst():
+    release = datetime.datetime.now() + datetime.timedelta(minutes=30)
+    burst = Burst(release.time(), window=10, interval=2, warm_lead=5, lead=1)
+    instant = burst.start + 1
+
+    assert not burst.warm_due(now=instant - 6)
+    assert 5 < burst.wait(now=instant - 11) <= 6
+    assert burst.warm_due(now=instant - 5)
+    assert not burst.warm_due(now=instant - 4)
+
+    assert not burst.tick(now=instant - 2)
+    assert burst.tick(now=instant - 1)
+    assert not burst.tick(now=instant)
+    # A late poll skips the ticks it missed.
+    assert burst.tick(now=instant + 4.5)
+    assert burst.wait(now=instant + 4.5) == 0.5
+    assert burst.tick(now=instant + 5)
+
+    # The next burst is a day later.
+    assert not burst.tick(now=instant + 10)
+    assert burst.release.date() == (release + datetime.timedelta(days=1)).date()
+    assert not burst.warmed
+
+
+def test_parse_release():
+    assert parse_release("7:00") == datetime.time(7, 0)
+    assert parse_release("07:00:30") == datetime.time(7, 0, 30)
+    with pytest.raises(ValueError):
+        parse_release("7am")
@@ -0,0 +1,82 @@
+import os
+
+from rgov.poller import Poller
+from rgov.scheduler import Scheduler
+from rgov.state import DaemonState
+from rgov.watches import Watch
+
+
+def new_poller(state):
+    poller = Poller(Scheduler(), None, state=state)
+    for spec in (
+        {"name": "a", "date": "06-29-2030", "length": "2", "ids": ["232489"]},
+        {
+            "name": "b",
+            "date": "06-29-2030",
+            "length": "2",
+            "ids": ["232489"],
+            "flexible": "07-05-2030",
+            "site_type": "tent",
+        },
+    ):
+        poller.add_watch(Watch.from_spec(spec))
+    return poller
+
+
+def test_checkpoint(tmp_path):
+    state = DaemonState(str(tmp_path / "daemon.db"))
+    poller = new_poller(state)
+    a, b = poller.watches
+    a.notifications = 2
+    poller.snapshots.update(("a", "232489"), 1, ["001", "002"])
+    poller.snapshots.update(("b", "232489"), 1, {740000: ["003"]})
+    poller.scheduler.record("232489", changed=False)
+    poller.checkpoint()
+    state.record_notification("a", "232489: site(s) 001, 002 available!", 1)
+
+    assert [spec["name"] for spec in state.watch_specs()] == ["a", "b"]
+    assert len(state.notifications("a")) == 1
+
+    restarted = new_poller(DaemonState(state.path))
+    assert restarted.state.restore(restarted) == {"a", "b"}
+    assert restarted.watches[0].notifications == 2
+    assert restarted.snapshots.update(("a", "232489"), 2, ["002", "001"]) is None
+    assert restarted.snapshots.update(("b", "232489"), 2, {740000: ["003"]}) is None
+    # The campground isn't due again straight away.
+    assert "232489" not in restarted.scheduler.due()
+
+
+def test_restore_changed_watch(tmp_path):
+    state = DaemonState(str(tmp_path / "daemon.db"))
+    poller = new_poller(state)
+    poller.watches[0].notifications = 1
+    poller.checkpoint()
+
+    restarted = Poller(Scheduler(), None)
+    restarted.add_watch(
+        Watch.from_spec(
+            {"name": "a", "date": "06-30-2030", "length": "2", "ids": ["232489"]}
+        )
+    )
+    assert state.restore(restarted) == set()
+    assert restarted.watches[0].notifications == 0
+
+
+def test_restore_paused(tmp_path):
+    state = DaemonState(str(tmp_path / "daemon.db"))
+    poller = new_poller(state)
+    poller.pause_watch(poller.watches[0])
+    poller.checkpoint()
+
+    restarted = new_poller(DaemonState(state.path))
+    restarted.state.restore(restarted)
+    a, b = restarted.watches
+    assert a.paused and not b.paused
+    # b still needs the campground, with its own site filter.
+    assert list(restarted.plan) == b.campgrounds
+
+
+def test_state_private(tmp_path):
+    state = DaemonState(str(tmp_path / "rgov" / "daemon.db"))
+    state.watch_specs()
+    assert os.stat(tmp_path / "rgov").st_mode & 0o777 == 0o700
@@ -0,0 +1,238 @@
+import socket
+import struct
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+from rgov import transport
+
+
+def respond(status, body=b"", headers=()):
+    def route(handler):
+        handler.send_response(status)
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    return route
+
+
+BODY = b'{"campsites": {}}' * 200
+
+
+def gzip(data):
+    obj = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    return obj.compress(data) + obj.flush()
+
+
+def raw_deflate(data):
+    obj = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return obj.compress(data) + obj.flush()
+
+
+def drop(handler):
+    """Hangs up without answering, as a server does when it times out
+    an idle keep-alive connection."""
+    handler.close_connection = True
+
+
+def reset(handler):
+    """Hangs up with a TCP reset, as a server does when it has already
+    forgotten a keep-alive connection."""
+    handler.connection.setsockopt(
+        socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+    )
+    # Closed here, before the server can shut it down gracefully.
+    handler.connection.close()
+    handler.close_connection = True
+
+
+def drop_once(then, hang_up=drop):
+    dropped = []
+
+    def route(handler):
+        if not dropped:
+            dropped.append(True)
+            hang_up(handler)
+        else:
+            then(handler)
+
+    return route
+
+
+@pytest.fixture
+def upstream():
+    """A local HTTP/1.1 server answering each path with routes[path].
+    Yields its URL, the routes and the (method, path) of every request
+    it got."""
+    routes = {}
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            requests.append((self.command, self.path))
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            routes[self.path](self)
+
+        do_POST = do_GET
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", routes, requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_retry_get(upstream):
+    url, routes, requests = upstream
+    routes["/ok"] = respond(200, b"ok")
+    routes["/flaky"] = drop_once(respond(200, b"flaky"))
+    pool = transport.ConnectionPool()
+
+    assert pool.request("GET", f"{url}/ok").body == b"ok"
+    # Sent on the pooled connection, dropped, then sent again.
+    assert pool.request("GET", f"{url}/flaky").body == b"flaky"
+    assert requests == [("GET", "/ok"), ("GET", "/flaky"), ("GET", "/flaky")]
+    pool.close()
+
+
+def test_retry_reset(upstream):
+    url, routes, requests = upstream
+    routes["/ok"] = respond(200, b"ok")
+    routes["/flaky"] = drop_once(respond(200, b"flaky"), reset)
+    pool = transport.ConnectionPool()
+
+    pool.request("GET", f"{url}/ok")
+    assert pool.request("GET", f"{url}/flaky").body == b"flaky"
+    assert requests.count(("GET", "/flaky")) == 2
+    pool.close()
+
+
+def test_retry_once(upstream):
+    url, routes, requests = upstream
+    routes["/down"] = drop
+    pool = transport.ConnectionPool()
+    assert pool.warm(url, 3) == 3
+
+    with pytest.raises(URLError):
+        pool.request("GET", f"{url}/down")
+    # Retried on a fresh connection, not on the other idle ones.
+    assert requests == [("GET", "/down"), ("GET", "/down")]
+    pool.close()
+
+
+def test_no_retry_post(upstream):
+    url, routes, requests = upstream
+    routes["/ok"] = respond(200, b"ok")
+    routes["/notify"] = drop
+    pool = transport.ConnectionPool()
+
+    pool.request("GET", f"{url}/ok")
+    with pytest.raises(URLError):
+        pool.request("POST", f"{url}/notify", b"m=hi")
+    # The notification may have been acted on, so it isn't sent twice.
+    assert requests.count(("POST", "/notify")) == 1
+    pool.close()
+
+
+@pytest.mark.parametrize(
+    "encoding, encode",
+    [("gzip", gzip), ("deflate", zlib.compress), ("deflate", raw_deflate)],
+)
+def test_decode(upstream, monkeypatch, encoding, encode):
+    url, routes, requests = upstream
+    wire = encode(BODY)
+    routes["/month"] = respond(200, wire, [("Content-Encoding", encoding)])
+    # Small reads, so the body is decoded over many chunks.
+    monkeypatch.setattr(transport, "CHUNK_SIZE", 16)
+    pool = transport.ConnectionPool()
+
+    resp = pool.request("GET", f"{url}/month")
+    assert resp.body == BODY
+    assert resp.wire_bytes == len(wire) < len(BODY)
+    assert (pool.wire_bytes, pool.decoded_bytes) == (len(wire), len(BODY))
+    pool.close()
+
+
+def test_not_modified(upstream):
+    url, routes, requests = upstream
+    routes["/month"] = respond(304, headers=[("ETag", '"v1"')])
+    pool = transport.ConnectionPool()
+
+    resp = pool.request("GET", f"{url}/month", headers={"If-None-Match": '"v1"'})
+    assert resp.status == 304
+    assert resp.body == b""
+    assert resp.wire_bytes == 0
+    pool.close()
+
+
+def test_server_error(upstream):
+    url, routes, requests = upstream
+    routes["/month"] = respond(503, b"busy")
+    pool = transport.ConnectionPool()
+
+    with pytest.raises(HTTPError) as info:
+        pool.request("GET", f"{url}/month")
+    assert info.value.code == 503
+    assert info.value.read() == b"busy"
+    pool.close()
+
+
+def test_redirect(upstream):
+    url, routes, requests = upstream
+    routes["/old"] = respond(301, headers=[("Location", "/month")])
+    routes["/month"] = respond(200, b"month")
+    routes["/form"] = respond(303, headers=[("Location", "/done")])
+    routes["/done"] = respond(200, b"done")
+    routes["/moved"] = respond(307, headers=[("Location", "/done")])
+    pool = transport.ConnectionPool()
+
+    resp = pool.request("GET", f"{url}/old")
+    assert (resp.url, resp.body) == (f"{url}/month", b"month")
+    # A form is followed to a page to GET...
+    assert pool.request("POST", f"{url}/form", b"m=hi").body == b"done"
+    assert requests[-2:] == [("POST", "/form"), ("GET", "/done")]
+    # ...but never sent on.
+    with pytest.raises(HTTPError) as info:
+        pool.request("POST", f"{url}/moved", b"m=hi")
+    assert info.value.code == 307
+    pool.close()
+
+
+def test_redirect_loop(upstream):
+    url, routes, requests = upstream
+    routes["/loop"] = respond(302, headers=[("Location", "/loop")])
+    pool = transport.ConnectionPool()
+
+    with pytest.raises(HTTPError):
+        pool.request("GET", f"{url}/loop")
+    assert len(requests) == transport.MAX_REDIRECTS + 1
+    pool.close()
+
+
+def test_proxy(upstream):
+    url, routes, requests = upstream
+    authorization = []
+
+    def route(handler):
+        authorization.append(handler.headers.get("Proxy-Authorization"))
+        respond(200, b"proxied")(handler)
+
+    # The upstream server stands in for the proxy.
+    routes["http://campgrounds.test/month"] = route
+    proxy = url.replace("http://", "http://user:secret@")
+    pool = transport.ConnectionPool(proxies={"http": proxy})
+
+    assert pool.request("GET", "http://campgrounds.test/month").body == b"proxied"
+    assert authorization == ["Basic dXNlcjpzZWNyZXQ="]
+    pool.close()
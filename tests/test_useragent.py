@@ -0,0 +1,28 @@
+from rgov import useragent
+from rgov.useragent import FALLBACK_USER_AGENTS, FixedUserAgent, UserAgentProvider
+
+
+def test_provider_loads_once_and_rotates():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return ["a", "b"]
+
+    provider = UserAgentProvider(loader)
+    assert [provider.get() for _ in range(5)] == ["a", "b", "a", "b", "a"]
+    assert len(calls) == 1
+
+
+def test_provider_falls_back_to_builtin_list():
+    provider = UserAgentProvider(lambda: [])
+    assert provider.get() == FALLBACK_USER_AGENTS[0]
+
+
+def test_fixed_user_agent():
+    useragent.set_provider(FixedUserAgent("rgov-bench"))
+    try:
+        assert useragent.get() == "rgov-bench"
+        assert useragent.get() == "rgov-bench"
+    finally:
+        useragent.set_provider(None)
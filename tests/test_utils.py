@@ -0,0 +1,43 @@
+from rgov.utils import plan_itinerary
+
+STAY_DATES = ["d1", "d2", "d3", "d4"]
+
+
+def test_plan_itinerary_fewest_moves():
+    dates_dict = {
+        "d1": {"A": ["1", "2"], "B": ["9"]},
+        "d2": {"A": ["1"], "B": ["9"]},
+        "d3": {"A": ["2"], "B": ["9"]},
+        "d4": {"A": ["2"]},
+    }
+    assert plan_itinerary(STAY_DATES, dates_dict) == [
+        ("A", "1", "d1", 2),
+        ("A", "2", "d3", 2),
+    ]
+
+
+def test_plan_itinerary_campground_first():
+    dates_dict = {
+        "d1": {"A": ["1"], "B": ["9"]},
+        "d2": {"A": ["2"], "B": ["9"]},
+        "d3": {"A": ["3"], "B": ["8"]},
+        "d4": {"A": ["3"], "B": ["8"]},
+    }
+    assert len(plan_itinerary(STAY_DATES, dates_dict)) == 2
+    assert plan_itinerary(STAY_DATES, dates_dict, campground_first=True) == [
+        ("B", "9", "d1", 2),
+        ("B", "8", "d3", 2),
+    ]
+
+    dates_dict["d2"] = {"A": ["2"]}
+    assert len(plan_itinerary(STAY_DATES, dates_dict)) == 3
+    assert plan_itinerary(STAY_DATES, dates_dict, campground_first=True) == [
+        ("A", "1", "d1", 1),
+        ("A", "2", "d2", 1),
+        ("A", "3", "d3", 2),
+    ]
+
+
+def test_plan_itinerary_uncovered_night():
+    dates_dict = {"d1": {"A": ["1"]}, "d2": {}, "d3": {"A": ["1"]}, "d4": {"A": ["1"]}}
+    assert plan_itinerary(STAY_DATES, dates_dict) is None
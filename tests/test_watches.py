@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from rgov.dates import DateRange
+from rgov.parse import SiteFilter
+from rgov.watches import NOTIFY_LIMIT, load_watches
+
+
+def test_load_watches(tmp_path):
+    path = tmp_path / "watches.json"
+    path.write_text(
+        json.dumps(
+            {
+                "watches": [
+                    {
+                        "name": "north rim",
+                        "date": "6-1-2030",
+                        "length": 2,
+                        "ids": "232489",
+                        "flexible": "6-30-2030",
+                        "site_type": "tent",
+                    },
+                    {
+                        "date": "3-20-2030",
+                        "length": "5",
+                        "ids": ["232489", 234064],
+                        "any_combo": True,
+                        "notify_limit": 1,
+                    },
+                ]
+            }
+        )
+    )
+    north_rim, second = load_watches(str(path))
+
+    assert north_rim.name == "north rim"
+    assert north_rim.ids == ["232489"]
+    assert isinstance(north_rim.dates, DateRange)
+    assert north_rim.flexible
+    assert north_rim.site_filter == SiteFilter(campsite_type="TENT")
+    assert north_rim.notify_limit == NOTIFY_LIMIT
+
+    assert second.name == "watch 2"
+    assert second.ids == ["232489", "234064"]
+    assert not second.flexible
+    assert second.any_combo
+    assert not second.site_filter
+
+
+def test_load_watches_invalid(tmp_path):
+    path = tmp_path / "watches.json"
+    path.write_text(json.dumps([{"date": "6-1-2030", "ids": ["232489"]}]))
+    with pytest.raises(ValueError):
+        load_watches(str(path))
+
+    path.write_text("{")
+    with pytest.raises(ValueError):
+        load_watches(str(path))